@@ -1,4 +1,5 @@
 import numpy as np
+import pandas as pd
 
 # Bolinger Bands
 def bollinger(data, period=20):
@@ -29,16 +30,73 @@ def EMA(data, period=20):
 
 # Weighted Moving Average (WMA)
 def WMA(data, period=20):
-    df = data.copy()
-    df[f'WMA{period}'] = ''
-    for i in range(len(data)):
-        wma_numerator = []
-        for j in range(period):
-            x = (period - j) * df['Close'][i - j]
-            wma_numerator.append(x)
-        df.iloc[i,-1] = sum(wma_numerator) / (period * (period + 1) / 2)
-    df.iloc[0:period-1, -1] = np.nan
-    return df[f'WMA{period}']
+    wma = WMA_array(data['Close'].to_numpy(dtype=float), period)
+    return pd.Series(wma, index=data.index, name=f'WMA{period}')
+
+# WMA for many periods at once (e.g. range(5,201) for a parameter sweep), one column per period
+def WMA_multi(data, periods):
+    periods = list(periods)
+    wma = WMA_array(data['Close'].to_numpy(dtype=float), periods)
+    return pd.DataFrame(wma, index=data.index, columns=[f'WMA{p}' for p in periods])
+
+# WMA on plain arrays (bars, or bars x tickers) from prefix sums, O(n) whatever the period.
+# with a list of periods the result gets an extra last axis, one slice per period.
+# the prefix sums restart every block of max(period) bars, with the bar numbers counted from the start of the block,
+# so they stay as small as a window's sums however long the series; a window lies in at most two blocks, and in each
+# block: sum of (k - start + 1) * x[k] = sum(k_block * x) + (block_start - start + 1) * sum(x)
+def WMA_array(close, period):
+    x = np.asarray(close, dtype=float)
+    one_dim = x.ndim == 1
+    if one_dim:
+        x = x[:, None]
+    periods = np.atleast_1d(np.asarray(period, dtype=int))
+    n, tickers = x.shape
+    block = max(int(periods.max()), 1)
+    blocks = -(-n // block)
+
+    missing = np.isnan(x)
+    padded = np.zeros((blocks * block, tickers))
+    padded[:n] = np.where(missing, 0, x)
+    padded = padded.reshape(blocks, block, tickers)
+    k_block = np.arange(block, dtype=float)[None, :, None]
+    # prefix sums within the blocks, up to & including each bar (inc) and before it (exc)
+    sums = {}
+    for name, values in (('x', padded), ('kx', k_block * padded)):
+        inc = np.cumsum(values, axis=1)
+        exc = np.concatenate([np.zeros((blocks, 1, tickers)), inc[:, :-1]], axis=1)
+        sums[name] = (inc.reshape(-1, tickers)[:n], exc.reshape(-1, tickers)[:n])
+    n_missing = np.concatenate([np.zeros((1, tickers)), np.cumsum(missing, axis=0)])
+
+    # window [start, last] of bars; windows that would start before the first bar are NaN
+    last = np.arange(n)[:, None]
+    start = last - periods[None, :] + 1
+    valid = start >= 0
+    start = np.where(valid, start, 0)
+    first_block, last_block = start // block * block, last // block * block
+    split = (first_block < last_block)[:, :, None]
+    first_end = np.minimum(first_block + block - 1, n - 1)
+    second_start, second_end = np.maximum(start, last_block), np.broadcast_to(last, start.shape)
+
+    def window_sum(name, lo, hi):
+        inc, exc = sums[name]
+        return inc[hi] - exc[lo]
+
+    # the part of the window in the block of its last bar, and the part in the block before if it is split
+    numerator = (window_sum('kx', second_start, second_end)
+                 + (last_block - start + 1)[:, :, None] * window_sum('x', second_start, second_end))
+    first = window_sum('kx', start, first_end) + (first_block - start + 1)[:, :, None] * window_sum('x', start, first_end)
+    numerator = numerator + np.where(split, first, 0)
+    wma = numerator / (periods * (periods + 1) / 2)[None, :, None]
+    bad = ~valid[:, :, None] | (n_missing[last + 1] - n_missing[start] > 0)
+    wma = np.where(bad, np.nan, wma)
+
+    # (bars, periods, tickers) -> (bars, tickers, periods)
+    wma = np.moveaxis(wma, 1, 2)
+    if one_dim:
+        wma = wma[:, 0]
+    if np.ndim(period) == 0:
+        wma = wma[..., 0]
+    return wma
 
 # Moving Averages Convergence Divergence (MACD)
 def MACD(data, slow = 26, fast = 12, smooth = 9):
@@ -104,54 +162,72 @@ def SSL(data, period=20):
 
 # SuperTrend
 def SuperTrend(data, multiplier=3, period=10):
-    df = data.copy()
-    df[['True Range','ATR']] = ATR(df, period)
-    
-    Median_Price = (df['High'] + df['Low'])/2
-
-    Down_Band = Median_Price - (multiplier * df['ATR'])
-    df['Down_Max'] = Down_Band.rolling(period, min_periods=period).max()
-
-    Up_Band = Median_Price + (multiplier * df['ATR'])
-    df['Up_Min'] = Up_Band.rolling(period, min_periods=period).min()
-
-    df['Super_Bottom'] = df['Down_Max'].copy()
-    for i in range(len(df)):
-        if df['Close'][i] < df['Super_Bottom'][i]:
-            df.iloc[i,-1] = np.nan
-        elif df['Super_Bottom'][i] < df['Super_Bottom'][i-1] and (df['Super_Bottom'][i] < df['Close'][i]):
-            df.iloc[i,-1] = df.iloc[i-1,-1]
-            if df['Close'][i] < df['Super_Bottom'][i]:
-                df.iloc[i,-1] = np.nan
-    df['Super_Bottom'].ffill(inplace=True)
-
-    df['Super_Top'] = df['Up_Min'].copy()
-    for i in range(len(df)):
-        if df['Close'][i] > df['Super_Top'][i]:
-            df.iloc[i,-1] = np.nan
-        elif df['Super_Top'][i] > df['Super_Top'][i-1] and (df['Super_Top'][i] > df['Close'][i]):
-            df.iloc[i,-1] = df.iloc[i-1,-1]
-            if df['Close'][i] > df['Super_Top'][i]:
-                df.iloc[i,-1] = np.nan
-    df['Super_Top'].ffill(inplace=True)
-
-    df['Top_or_Bottom'] = ''
-    for i in range(len(df)):
-        if (df['Close'][i] > df['Super_Bottom'][i]) and (df['Close'][i] > df['Super_Top'][i]):
-            df.iloc[i,-1] = 'Bottom'
-        elif (df['Close'][i] < df['Super_Bottom'][i]) and (df['Close'][i] < df['Super_Top'][i]):
-            df.iloc[i,-1] = 'Top'
-        else:
-            df.iloc[i,-1] = np.nan
-    df['Top_or_Bottom'].fillna(method='ffill', inplace=True)
-    df['Top_or_Bottom'].fillna(method='bfill', inplace=True)
-
-    df['SuperTrend'] = ''
-    for i in range(len(df)):
-        line = df['Top_or_Bottom'][i]
-        df.iloc[i,-1] = df[f'Super_{line}'].iloc[i]
-
-    return df['SuperTrend']
+    st = SuperTrend_array(data['High'].to_numpy(dtype=float), data['Low'].to_numpy(dtype=float),
+                          data['Close'].to_numpy(dtype=float), multiplier, period)
+    return pd.Series(st, index=data.index, name='SuperTrend')
+
+# SuperTrend on plain arrays, either 1-D (bars) or 2-D (bars x tickers)
+# the band-carrying state machine is a single pass over the bars, vectorised across the tickers
+# an ATR of the same period that has already been computed can be passed in to avoid recomputing it
+# with state=True the Top_or_Bottom state is also returned as int8 codes (1 Bottom, -1 Top, 0 not known)
+def SuperTrend_array(high, low, close, multiplier=3, period=10, atr=None, state=False):
+    high, low, close = np.asarray(high, dtype=float), np.asarray(low, dtype=float), np.asarray(close, dtype=float)
+    one_dim = close.ndim == 1
+    if one_dim:
+        high, low, close = high[:, None], low[:, None], close[:, None]
+
+    if atr is None:
+        # True Range & ATR (NaN-skipping max, the same as ATR() above)
+        prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+        true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+        atr = pd.DataFrame(true_range).rolling(window=period, min_periods=period).mean().to_numpy()
+    else:
+        atr = np.asarray(atr, dtype=float).reshape(close.shape)
+
+    median_price = (high + low)/2
+    down_max = pd.DataFrame(median_price - (multiplier * atr)).rolling(period, min_periods=period).max().to_numpy()
+    up_min = pd.DataFrame(median_price + (multiplier * atr)).rolling(period, min_periods=period).min().to_numpy()
+
+    super_bottom = _ffill(_carry_band(down_max, close, 1))
+    super_top = _ffill(_carry_band(up_min, close, -1))
+
+    # 1 when the close is above both lines (use the bottom line), -1 when below both (use the top line)
+    top_or_bottom = np.where((close > super_bottom) & (close > super_top), 1.0,
+                             np.where((close < super_bottom) & (close < super_top), -1.0, np.nan))
+    top_or_bottom = _bfill(_ffill(top_or_bottom))
+    supertrend = np.where(top_or_bottom == 1, super_bottom, np.where(top_or_bottom == -1, super_top, np.nan))
+
+    if one_dim:
+        supertrend, top_or_bottom = supertrend[:, 0], top_or_bottom[:, 0]
+    if state:
+        return supertrend, np.nan_to_num(top_or_bottom).astype(np.int8)
+    return supertrend
+
+# carry the previous band value forward while the raw band moves against the trend,
+# drop it (NaN) once the close crosses the band. side is 1 for the bottom band, -1 for the top band.
+def _carry_band(band, close, side):
+    out = np.empty_like(band)
+    # flip the sign for the top band so that both bands use the same comparisons
+    band_s, close_s = side * band, side * close
+    # like the original row loop, the first bar is compared against the last raw value
+    prev = band_s[-1]
+    for i in range(band.shape[0]):
+        raw, c = band_s[i], close_s[i]
+        carried = np.where(c < prev, np.nan, prev)
+        prev = np.where(c < raw, np.nan, np.where((raw < prev) & (raw < c), carried, raw))
+        out[i] = prev
+    return side * out
+
+# forward / backward fill NaNs along the bars axis of a 2-D array
+def _ffill(arr):
+    idx = np.where(np.isnan(arr), 0, np.arange(arr.shape[0])[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    out = arr[idx, np.arange(arr.shape[1])]
+    # leading NaNs are left as they are
+    return out
+
+def _bfill(arr):
+    return _ffill(arr[::-1])[::-1]
 
 # On Balance Volume (OBV)
 def OBV(data):
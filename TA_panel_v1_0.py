@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+from TA_indicators_v2_1 import SuperTrend_array, WMA_array
+
+# Panel versions of the indicators in TA_indicators_v2_1: every indicator is computed for the whole universe
+# in one call, on (bars x tickers) arrays instead of one DataFrame per ticker.
+#
+# Ragged histories (IPO dates, missing bars) are handled with a mask: each ticker's valid bars are packed to the
+# top of its column so that rolling windows run over that ticker's own bars only, exactly as if the indicator had
+# been computed on the ticker's own DataFrame, then the results are unpacked back onto the common date index.
+#
+# compact=True stores the prices and the indicator results as float32 (the indicators are still computed in
+# float64 by pandas and rounded when unpacked), which halves the memory of a full-universe panel; states such as
+# the SuperTrend Top/Bottom are int8 codes. See the README for the tolerance against the float64 results.
+
+# build a panel from a dictionary of per-ticker OHLCV DataFrames (e.g. the output of yf.download for each ticker)
+def make_panel(frames, fields=('Open','High','Low','Close','Volume'), compact=False):
+    tickers = list(frames.keys())
+    index = frames[tickers[0]].index
+    for ticker in tickers[1:]:
+        index = index.union(frames[ticker].index)
+    wide = {field: pd.concat([frames[ticker][field].reindex(index).rename(ticker) for ticker in tickers], axis=1)
+            for field in fields}
+    return panel_from_arrays(wide, index=index, tickers=tickers, compact=compact)
+
+# build a panel from aligned (bars x tickers) arrays or wide DataFrames, one per field.
+# a bar is valid where the mask is True, by default where the close price is available.
+def panel_from_arrays(fields, index=None, tickers=None, mask=None, compact=False):
+    first = next(iter(fields.values()))
+    if isinstance(first, pd.DataFrame):
+        index = first.index if index is None else index
+        tickers = list(first.columns) if tickers is None else tickers
+    dtype = np.float32 if compact else np.float64
+    values = {field: np.asarray(arr, dtype=dtype) for field, arr in fields.items()}
+    n, k = next(iter(values.values())).shape
+    index = pd.RangeIndex(n) if index is None else index
+    tickers = list(range(k)) if tickers is None else list(tickers)
+    if mask is None:
+        mask = ~np.isnan(values['Close'])
+    mask = np.asarray(mask, dtype=bool)
+
+    # valid bars first (in date order), then the missing ones
+    order = np.argsort(~mask, axis=0, kind='stable').astype(np.int32 if compact else np.int64)
+    count = mask.sum(axis=0)
+    panel = {'index': index, 'tickers': tickers, 'mask': mask, 'order': order, 'count': count, 'dtype': dtype}
+    for field, arr in values.items():
+        panel[field] = pack(panel, arr)
+    return panel
+
+# move each ticker's valid bars to the top of its column (the padding at the bottom is NaN)
+def pack(panel, arr):
+    packed = np.take_along_axis(np.asarray(arr, dtype=panel['dtype']), panel['order'], axis=0)
+    packed[np.arange(packed.shape[0])[:, None] >= panel['count']] = np.nan
+    return packed
+
+# put packed values back on the panel's date index as a wide DataFrame (NaN where a ticker has no bar,
+# or `fill` for integer codes)
+def unpack(panel, packed, dtype=None, fill=np.nan):
+    dtype = panel['dtype'] if dtype is None else dtype
+    packed = np.asarray(packed, dtype=dtype)
+    out = np.full(packed.shape, fill, dtype=dtype)
+    valid = np.arange(packed.shape[0])[:, None] < panel['count']
+    np.put_along_axis(out, panel['order'], np.where(valid, packed, fill).astype(dtype), axis=0)
+    out[~panel['mask']] = fill
+    return pd.DataFrame(out, index=panel['index'], columns=panel['tickers'])
+
+def _frame(arr):
+    return pd.DataFrame(arr)
+
+# Percent change in the closing price
+def percent_change_panel(panel):
+    return unpack(panel, _frame(panel['Close']).pct_change().to_numpy())
+
+# Bolinger Bands
+def bollinger_panel(panel, period=20):
+    close = _frame(panel['Close'])
+    rolling_mean = close.rolling(window=period).mean()
+    rolling_std = close.rolling(window=period).std()
+    return {'UpperBand': unpack(panel, rolling_mean + (2*rolling_std)),
+            'LowerBand': unpack(panel, rolling_mean - (2*rolling_std))}
+
+# Relative Strength Index (RSI)
+def RSI_panel(panel, period=14):
+    delta = _frame(panel['Close']).diff()
+    gain = delta.where(delta >= 0, 0)
+    loss = abs(delta.where(delta < 0, 0))
+    RS = gain.rolling(period).mean() / loss.rolling(period).mean()
+    return unpack(panel, 100 - (100/(1 + RS)))
+
+# Exponential Moving Averages (EMA)
+def EMA_panel(panel, period=20):
+    return unpack(panel, _frame(panel['Close']).ewm(span=period, adjust=False, min_periods=period).mean())
+
+# Weighted Moving Average (WMA)
+def WMA_panel(panel, period=20):
+    return unpack(panel, WMA_array(panel['Close'], period))
+
+# Moving Averages Convergence Divergence (MACD)
+def MACD_panel(panel, slow = 26, fast = 12, smooth = 9):
+    close = _frame(panel['Close'])
+    slow_EMA = close.ewm(span=slow, adjust=False, min_periods=slow).mean()
+    fast_EMA = close.ewm(span=fast, adjust=False, min_periods=fast).mean()
+    macd = fast_EMA - slow_EMA
+    signal = macd.ewm(span=smooth, adjust=False, min_periods=smooth).mean()
+    return {'MACD': unpack(panel, macd), 'Signal': unpack(panel, signal), 'Histogram': unpack(panel, macd - signal)}
+
+# Chaikin Money Flow (CMF)
+def CMF_panel(panel, period):
+    high, low, close, volume = (_frame(panel[f]) for f in ('High','Low','Close','Volume'))
+    cmf_multiplier = ((close - low) - (high - close)) / (high - low)
+    cmf_volume = cmf_multiplier * volume
+    cmf = (cmf_volume.rolling(window = period, min_periods = period).sum()) / (volume.rolling(window = period, min_periods = period).sum())
+    return unpack(panel, cmf)
+
+# True Range on packed arrays (NaN-skipping max of the three ranges, as in ATR)
+def _true_range(panel):
+    high, low, close = panel['High'], panel['Low'], panel['Close']
+    prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    return np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+# Average True Range (ATR)
+def ATR_panel(panel, period=14):
+    true_range = _true_range(panel)
+    atr = _frame(true_range).rolling(window = period, min_periods = period).mean()
+    return {'True Range': unpack(panel, true_range), 'ATR': unpack(panel, atr)}
+
+# Choppiness Index (CHOP)
+def CHOP_panel(panel, period):
+    sum_TR = _frame(_true_range(panel)).rolling(window = period, min_periods = period).sum()
+    Max_High = _frame(panel['High']).rolling(window = period, min_periods = period).max()
+    Min_Low = _frame(panel['Low']).rolling(window = period, min_periods = period).min()
+    return unpack(panel, 100 * np.log10(sum_TR/(Max_High - Min_Low)) / np.log10(period))
+
+# Vortex Indicator
+def vortex_panel(panel, period):
+    high, low = _frame(panel['High']), _frame(panel['Low'])
+    plus_VM = abs(high - low.shift(1))
+    minus_VM = abs(low - high.shift(1))
+    plus_VM_sum = plus_VM.rolling(window = period, min_periods = period).sum()
+    minus_VM_sum = minus_VM.rolling(window = period, min_periods = period).sum()
+    sum_TR = _frame(_true_range(panel)).rolling(window = period, min_periods = period).sum()
+    return {'VI+': unpack(panel, plus_VM_sum / sum_TR), 'VI-': unpack(panel, minus_VM_sum / sum_TR)}
+
+# SSL Channel
+def SSL_panel(panel, period=20):
+    high_sma = _frame(panel['High']).rolling(window=period).mean().to_numpy()
+    low_sma = _frame(panel['Low']).rolling(window=period).mean().to_numpy()
+    close = panel['Close']
+    hi_lo = _frame(np.where(close > high_sma, 1, np.where(close < low_sma, -1, np.nan))).ffill().to_numpy()
+    return {'SSL Down': unpack(panel, np.where(hi_lo < 0, high_sma, low_sma)),
+            'SSL Up': unpack(panel, np.where(hi_lo < 0, low_sma, high_sma))}
+
+# SuperTrend (with state=True, also the Top_or_Bottom state as int8 codes: 1 Bottom, -1 Top, 0 not known)
+def SuperTrend_panel(panel, multiplier=3, period=10, state=False):
+    supertrend, top_or_bottom = SuperTrend_array(panel['High'], panel['Low'], panel['Close'], multiplier, period, state=True)
+    if state:
+        return {'SuperTrend': unpack(panel, supertrend), 'Top_or_Bottom': unpack(panel, top_or_bottom, np.int8, 0)}
+    return unpack(panel, supertrend)
+
+# On Balance Volume (OBV)
+def OBV_panel(panel):
+    daily_ret = _frame(panel['Close']).pct_change().to_numpy()
+    direction = np.where(daily_ret >= 0, 1, -1)
+    direction[0] = 0
+    return unpack(panel, _frame(panel['Volume'] * direction).cumsum())
+
+# Average Directional Index (ADX), with the ATR of the given period computed on the way
+def ADX_panel(panel, period=14, atr_period=14):
+    high, low = _frame(panel['High']), _frame(panel['Low'])
+    atr = _frame(_true_range(panel)).rolling(window = atr_period, min_periods = atr_period).mean()
+    upmove = high - high.shift(1)
+    downmove = low.shift(1) - low
+    plus_dm = _frame(np.where((upmove > downmove) & (upmove > 0), upmove, 0))
+    minus_dm = _frame(np.where((downmove > upmove) & (downmove > 0), downmove, 0))
+    plus_di = 100 * (plus_dm/atr).ewm(alpha=1/period, min_periods=period).mean()
+    minus_di = 100 * (minus_dm/atr).ewm(alpha=1/period, min_periods=period).mean()
+    return unpack(panel, 100* abs((plus_di - minus_di)/(plus_di + minus_di)).ewm(alpha=1/period, min_periods=period).mean())
@@ -0,0 +1,360 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Streaming versions of the indicators in TA_indicators_v2_1: each indicator keeps its state between bars, so a
+# new bar costs O(1) instead of recomputing over the full history.
+#
+#     ema = StreamingEMA(20)
+#     history = ema.update_batch(df)                 # seed from the history, same values as EMA(df, 20)
+#     value = ema.update({'Close': 101.5})           # then one bar at a time (a dict, or a row of a DataFrame)
+#
+# Rolling sums & means use running (compensated) sums with the same add/remove arithmetic as pandas' rolling
+# windows, rolling max/min use monotonic deques and the EMAs use the recursion of pandas' ewm(adjust=False), so the
+# values match the batch functions. Two exceptions: SuperTrend cannot back-fill its first bars (the batch function
+# uses the first Top/Bottom state found later in the data), so the stream is NaN until the first state is known;
+# and pandas' pct_change of old versions fills missing closes, which the OBV stream does not.
+
+# running sum / mean of the last `window` values (NaNs are skipped, NaN result below min_periods),
+# following the add / remove steps of pandas' rolling sum & mean
+class RollingSum:
+    def __init__(self, window, min_periods=None, mean=False):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.mean = mean
+        self.values = deque()
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.neg_ct = 0
+        self.same_value = 0
+        self.prev_value = None
+
+    def update(self, val):
+        if self.window == 1:
+            # pandas starts every 1-bar window from scratch
+            self.values.clear()
+            self.nobs = self.neg_ct = self.same_value = 0
+            self.sum_x = self.compensation_add = self.compensation_remove = 0.0
+            self.prev_value = None
+        elif len(self.values) == self.window:
+            old = self.values.popleft()
+            if old == old:
+                self.nobs -= 1
+                y = - old - self.compensation_remove
+                t = self.sum_x + y
+                self.compensation_remove = t - self.sum_x - y
+                self.sum_x = t
+                if math.copysign(1, old) < 0:
+                    self.neg_ct -= 1
+        self.values.append(val)
+        if val == val:
+            self.nobs += 1
+            y = val - self.compensation_add
+            t = self.sum_x + y
+            self.compensation_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1, val) < 0:
+                self.neg_ct += 1
+            self.same_value = self.same_value + 1 if val == self.prev_value else 1
+            self.prev_value = val
+        return self.value()
+
+    def value(self):
+        if self.nobs < self.min_periods or self.nobs == 0:
+            return 0.0 if (self.nobs == 0 == self.min_periods and not self.mean) else np.nan
+        if self.mean:
+            result = self.sum_x / self.nobs
+            if self.same_value >= self.nobs:
+                result = self.prev_value
+            elif self.neg_ct == 0 and result < 0:
+                result = 0.0
+            elif self.neg_ct == self.nobs and result > 0:
+                result = 0.0
+            return result
+        if self.same_value >= self.nobs:
+            return self.prev_value * self.nobs
+        return self.sum_x
+
+# running standard deviation (ddof=1) of the last `window` values, Welford's updates for adding & removing a value
+class RollingStd:
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+
+    def update(self, val):
+        if len(self.values) == self.window:
+            old = self.values.popleft()
+            if old == old:
+                self.nobs -= 1
+                if self.nobs:
+                    delta = old - self.mean_x
+                    self.mean_x -= delta / self.nobs
+                    self.ssqdm_x -= delta * (old - self.mean_x)
+                else:
+                    self.mean_x = self.ssqdm_x = 0.0
+        self.values.append(val)
+        if val == val:
+            self.nobs += 1
+            delta = val - self.mean_x
+            self.mean_x += delta / self.nobs
+            self.ssqdm_x += delta * (val - self.mean_x)
+        if self.nobs < self.window:
+            return np.nan
+        return math.sqrt(max(self.ssqdm_x, 0.0) / (self.nobs - 1)) if self.nobs > 1 else np.nan
+
+# running maximum (or minimum with sign=-1) of the last `window` values, with a monotonic deque
+class RollingMax:
+    def __init__(self, window, min_periods=None, sign=1):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.sign = sign
+        self.bar = -1
+        self.candidates = deque()   # (bar, value), values decreasing
+        self.valid = deque()        # bars with a value
+
+    def update(self, val):
+        self.bar += 1
+        first = self.bar - self.window + 1
+        while self.candidates and self.candidates[0][0] < first:
+            self.candidates.popleft()
+        while self.valid and self.valid[0] < first:
+            self.valid.popleft()
+        if val == val:
+            while self.candidates and self.sign * self.candidates[-1][1] <= self.sign * val:
+                self.candidates.pop()
+            self.candidates.append((self.bar, val))
+            self.valid.append(self.bar)
+        if len(self.valid) < self.min_periods or not self.candidates:
+            return np.nan
+        return self.candidates[0][1]
+
+# ewm(span, adjust=False, min_periods) mean, one value at a time (same recursion as pandas, NaNs are not observations)
+class _EWM:
+    def __init__(self, span, min_periods=0):
+        self.alpha = 2 / (span + 1)
+        self.min_periods = max(min_periods, 1)
+        self.weighted = np.nan
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    def update(self, cur):
+        is_observation = cur == cur
+        self.nobs += is_observation
+        if self.weighted == self.weighted:
+            self.old_wt *= 1 - self.alpha
+            if is_observation:
+                if self.weighted != cur:
+                    self.weighted = (self.old_wt * self.weighted + self.alpha * cur) / (self.old_wt + self.alpha)
+                self.old_wt = 1.0
+        elif is_observation:
+            self.weighted = cur
+        return self.weighted if self.nobs >= self.min_periods else np.nan
+
+def _true_range(high, low, prev_close):
+    ranges = [r for r in (high - low, abs(high - prev_close), abs(low - prev_close)) if r == r]
+    return max(ranges) if ranges else np.nan
+
+# common interface: update(bar) for one bar, update_batch(data) for many bars (e.g. to seed from a history)
+class StreamingIndicator:
+    columns = None
+
+    def update(self, bar):
+        raise NotImplementedError
+
+    def update_batch(self, data):
+        rows = [self.update(bar) for bar in data.to_dict('records')]
+        if self.columns is None:
+            return pd.Series(rows, index=data.index, name=self.name, dtype=float)
+        return pd.DataFrame(rows, index=data.index, columns=self.columns, dtype=float)
+
+# Exponential Moving Averages (EMA)
+class StreamingEMA(StreamingIndicator):
+    def __init__(self, period=20):
+        self.name = f'EMA{period}'
+        self.ewm = _EWM(period, period)
+
+    def update(self, bar):
+        return self.ewm.update(bar['Close'])
+
+# Moving Averages Convergence Divergence (MACD)
+class StreamingMACD(StreamingIndicator):
+    columns = ['MACD','Signal','Histogram']
+
+    def __init__(self, slow = 26, fast = 12, smooth = 9):
+        self.slow, self.fast, self.signal = _EWM(slow, slow), _EWM(fast, fast), _EWM(smooth, smooth)
+
+    def update(self, bar):
+        macd = self.fast.update(bar['Close']) - self.slow.update(bar['Close'])
+        signal = self.signal.update(macd)
+        return {'MACD': macd, 'Signal': signal, 'Histogram': macd - signal}
+
+# Average True Range (ATR)
+class StreamingATR(StreamingIndicator):
+    columns = ['True Range','ATR']
+
+    def __init__(self, period=14):
+        self.prev_close = np.nan
+        self.atr = RollingSum(period, mean=True)
+
+    def update(self, bar):
+        true_range = _true_range(bar['High'], bar['Low'], self.prev_close)
+        self.prev_close = bar['Close']
+        return {'True Range': true_range, 'ATR': self.atr.update(true_range)}
+
+# Relative Strength Index (RSI)
+class StreamingRSI(StreamingIndicator):
+    name = 'RSI'
+
+    def __init__(self, period=14):
+        self.prev_close = np.nan
+        self.avg_gain = RollingSum(period, mean=True)
+        self.avg_loss = RollingSum(period, mean=True)
+
+    def update(self, bar):
+        delta = bar['Close'] - self.prev_close
+        self.prev_close = bar['Close']
+        # like where(delta >= 0, 0): the first bar counts as no gain & no loss
+        gain = delta if delta >= 0 else 0.0
+        loss = abs(delta) if delta < 0 else 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            RS = np.float64(self.avg_gain.update(gain)) / np.float64(self.avg_loss.update(loss))
+            return float(100 - (100/(1 + RS)))
+
+# Bolinger Bands
+class StreamingBollinger(StreamingIndicator):
+    columns = ['UpperBand','LowerBand']
+
+    def __init__(self, period=20):
+        self.mean = RollingSum(period, mean=True)
+        self.std = RollingStd(period)
+
+    def update(self, bar):
+        rolling_mean, rolling_std = self.mean.update(bar['Close']), self.std.update(bar['Close'])
+        return {'UpperBand': rolling_mean + (2*rolling_std), 'LowerBand': rolling_mean - (2*rolling_std)}
+
+# SSL Channel
+class StreamingSSL(StreamingIndicator):
+    columns = ['SSL Down','SSL Up']
+
+    def __init__(self, period=20):
+        self.high_sma = RollingSum(period, mean=True)
+        self.low_sma = RollingSum(period, mean=True)
+        self.hi_lo = np.nan
+
+    def update(self, bar):
+        high_sma, low_sma = self.high_sma.update(bar['High']), self.low_sma.update(bar['Low'])
+        if bar['Close'] > high_sma:
+            self.hi_lo = 1
+        elif bar['Close'] < low_sma:
+            self.hi_lo = -1
+        if self.hi_lo < 0:
+            return {'SSL Down': high_sma, 'SSL Up': low_sma}
+        return {'SSL Down': low_sma, 'SSL Up': high_sma}
+
+# Vortex Indicator (computes its own True Range)
+class StreamingVortex(StreamingIndicator):
+    columns = ['VI+','VI-']
+
+    def __init__(self, period):
+        self.prev = {'High': np.nan, 'Low': np.nan, 'Close': np.nan}
+        self.plus_VM = RollingSum(period)
+        self.minus_VM = RollingSum(period)
+        self.sum_TR = RollingSum(period)
+
+    def update(self, bar):
+        plus_VM_sum = self.plus_VM.update(abs(bar['High'] - self.prev['Low']))
+        minus_VM_sum = self.minus_VM.update(abs(bar['Low'] - self.prev['High']))
+        sum_TR = self.sum_TR.update(_true_range(bar['High'], bar['Low'], self.prev['Close']))
+        self.prev = {'High': bar['High'], 'Low': bar['Low'], 'Close': bar['Close']}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {'VI+': float(np.float64(plus_VM_sum) / sum_TR), 'VI-': float(np.float64(minus_VM_sum) / sum_TR)}
+
+# Choppiness Index (CHOP) (computes its own True Range)
+class StreamingCHOP(StreamingIndicator):
+    name = 'CHOP'
+
+    def __init__(self, period):
+        self.period = period
+        self.prev_close = np.nan
+        self.sum_TR = RollingSum(period)
+        self.max_high = RollingMax(period)
+        self.min_low = RollingMax(period, sign=-1)
+
+    def update(self, bar):
+        sum_TR = self.sum_TR.update(_true_range(bar['High'], bar['Low'], self.prev_close))
+        self.prev_close = bar['Close']
+        Max_High, Min_Low = self.max_high.update(bar['High']), self.min_low.update(bar['Low'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return float(100 * np.log10(np.float64(sum_TR)/(Max_High - Min_Low)) / np.log10(self.period))
+
+# On Balance Volume (OBV)
+class StreamingOBV(StreamingIndicator):
+    name = 'OBV'
+
+    def __init__(self):
+        self.prev_close = None
+        self.obv = 0.0
+
+    def update(self, bar):
+        if self.prev_close is None:
+            direction = 0
+        else:
+            direction = 1 if bar['Close'] / self.prev_close - 1 >= 0 else -1
+        self.prev_close = bar['Close']
+        self.obv += bar['Volume'] * direction
+        return self.obv
+
+# SuperTrend
+class StreamingSuperTrend(StreamingIndicator):
+    name = 'SuperTrend'
+
+    def __init__(self, multiplier=3, period=10):
+        self.multiplier = multiplier
+        self.atr = StreamingATR(period)
+        self.down_max = RollingMax(period)
+        self.up_min = RollingMax(period, sign=-1)
+        # carried band values (before & after forward filling) and the last Top/Bottom state
+        self.bottom = self.top = np.nan
+        self.bottom_filled = self.top_filled = np.nan
+        self.state = 0
+
+    # same band-carrying step as TA_indicators_v2_1._carry_band, side 1 for the bottom band & -1 for the top band
+    @staticmethod
+    def _carry(raw, prev, close, side):
+        raw_s, prev_s, c = side * raw, side * prev, side * close
+        if c < raw_s:
+            return np.nan
+        if raw_s < prev_s and raw_s < c:
+            return np.nan if c < prev_s else prev
+        return raw
+
+    def update(self, bar):
+        atr = self.atr.update(bar)['ATR']
+        median_price = (bar['High'] + bar['Low'])/2
+        down_max = self.down_max.update(median_price - (self.multiplier * atr))
+        up_min = self.up_min.update(median_price + (self.multiplier * atr))
+
+        close = bar['Close']
+        self.bottom = self._carry(down_max, self.bottom, close, 1)
+        self.top = self._carry(up_min, self.top, close, -1)
+        if self.bottom == self.bottom:
+            self.bottom_filled = self.bottom
+        if self.top == self.top:
+            self.top_filled = self.top
+
+        if close > self.bottom_filled and close > self.top_filled:
+            self.state = 1
+        elif close < self.bottom_filled and close < self.top_filled:
+            self.state = -1
+        if self.state == 1:
+            return self.bottom_filled
+        if self.state == -1:
+            return self.top_filled
+        return np.nan
@@ -0,0 +1,203 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+from TA_indicators_v2_1 import SuperTrend_array, WMA_array
+
+# Zero-copy versions of the indicators in TA_indicators_v2_1.
+#
+# The functions in TA_indicators_v2_1 start with df = data.copy(), so every call copies the whole frame (with
+# all the indicator columns added so far). The functions here only read the columns they need, as NumPy views
+# of the frame, and write the result into the `out` array(s) given by the caller (or newly allocated ones).
+# They return plain arrays, in the same order as the columns returned by TA_indicators_v2_1:
+#
+#     import TA_views_v1_0 as tav
+#     out = np.empty((len(df), 2))
+#     tav.SSL(df, 20, out=out)                        # out[:, 0] = SSL Down, out[:, 1] = SSL Up
+#     ema = tav.EMA(df, 20)                           # newly allocated
+#
+# Run this file for a memory benchmark of a universe run with both versions (peak RSS of each, in a subprocess):
+#     python TA_views_v1_0.py [n_tickers] [n_bars] [n_extra_columns]
+
+def _col(data, column):
+    return data[column].to_numpy(dtype=np.float64, copy=False)
+
+def _series(arr):
+    return pd.Series(arr, copy=False)
+
+def _out(out, n, k=None):
+    if out is None:
+        return np.empty(n) if k is None else np.empty((n, k))
+    return out
+
+def _write(out, *results):
+    if out.ndim == 1:
+        np.copyto(out, results[0])
+    else:
+        for j, result in enumerate(results):
+            np.copyto(out[:, j], result)
+    return out
+
+def _true_range(data):
+    if 'True Range' in data:
+        return _col(data, 'True Range')
+    high, low, close = _col(data, 'High'), _col(data, 'Low'), _col(data, 'Close')
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    return np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+# Bolinger Bands -> UpperBand, LowerBand
+def bollinger(data, period=20, out=None):
+    close = _series(_col(data, 'Close'))
+    rolling_mean = close.rolling(window=period).mean().to_numpy()
+    rolling_std = close.rolling(window=period).std().to_numpy()
+    return _write(_out(out, len(data), 2), rolling_mean + (2*rolling_std), rolling_mean - (2*rolling_std))
+
+# Relative Strength Index (RSI)
+def RSI(data, period=14, out=None):
+    delta = _series(_col(data, 'Close')).diff()
+    gain = delta.where(delta >= 0, 0)
+    loss = abs(delta.where(delta < 0, 0))
+    RS = gain.rolling(period).mean() / loss.rolling(period).mean()
+    return _write(_out(out, len(data)), (100 - (100/(1 + RS))).to_numpy())
+
+# Exponential Moving Averages (EMA)
+def EMA(data, period=20, out=None):
+    ema = _series(_col(data, 'Close')).ewm(span=period, adjust=False, min_periods=period).mean()
+    return _write(_out(out, len(data)), ema.to_numpy())
+
+# Weighted Moving Average (WMA)
+def WMA(data, period=20, out=None):
+    return _write(_out(out, len(data)), WMA_array(_col(data, 'Close'), period))
+
+# Moving Averages Convergence Divergence (MACD) -> MACD, Signal, Histogram
+def MACD(data, slow = 26, fast = 12, smooth = 9, out=None):
+    close = _series(_col(data, 'Close'))
+    slow_EMA = close.ewm(span=slow, adjust=False, min_periods=slow).mean()
+    fast_EMA = close.ewm(span=fast, adjust=False, min_periods=fast).mean()
+    macd = fast_EMA - slow_EMA
+    signal = macd.ewm(span=smooth, adjust=False, min_periods=smooth).mean()
+    return _write(_out(out, len(data), 3), macd.to_numpy(), signal.to_numpy(), (macd - signal).to_numpy())
+
+# Chaikin Money Flow (CMF)
+def CMF(data, period, out=None):
+    high, low, close = _col(data, 'High'), _col(data, 'Low'), _col(data, 'Close')
+    volume = _series(_col(data, 'Volume'))
+    cmf_multiplier = ((close - low) - (high - close)) / (high - low)
+    cmf_volume = _series(cmf_multiplier * volume.to_numpy())
+    cmf = (cmf_volume.rolling(window = period, min_periods = period).sum()) / (volume.rolling(window = period, min_periods = period).sum())
+    return _write(_out(out, len(data)), cmf.to_numpy())
+
+# Average True Range (ATR) -> True Range, ATR (always computed from High, Low & Close)
+def ATR(data, period=14, out=None):
+    high, low, close = _col(data, 'High'), _col(data, 'Low'), _col(data, 'Close')
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    atr = _series(true_range).rolling(window = period, min_periods = period).mean()
+    return _write(_out(out, len(data), 2), true_range, atr.to_numpy())
+
+# Choppiness Index (CHOP), uses the 'True Range' column if there is one
+def CHOP(data, period, out=None):
+    sum_TR = _series(_true_range(data)).rolling(window = period, min_periods = period).sum()
+    Max_High = _series(_col(data, 'High')).rolling(window = period, min_periods = period).max()
+    Min_Low = _series(_col(data, 'Low')).rolling(window = period, min_periods = period).min()
+    return _write(_out(out, len(data)), (100 * np.log10(sum_TR/(Max_High - Min_Low)) / np.log10(period)).to_numpy())
+
+# Vortex Indicator -> VI+, VI-, uses the 'True Range' column if there is one
+def vortex(data, period, out=None):
+    high, low = _col(data, 'High'), _col(data, 'Low')
+    plus_VM = _series(np.abs(high - np.concatenate([[np.nan], low[:-1]])))
+    minus_VM = _series(np.abs(low - np.concatenate([[np.nan], high[:-1]])))
+    plus_VM_sum = plus_VM.rolling(window = period, min_periods = period).sum().to_numpy()
+    minus_VM_sum = minus_VM.rolling(window = period, min_periods = period).sum().to_numpy()
+    sum_TR = _series(_true_range(data)).rolling(window = period, min_periods = period).sum().to_numpy()
+    return _write(_out(out, len(data), 2), plus_VM_sum / sum_TR, minus_VM_sum / sum_TR)
+
+# SSL Channel -> SSL Down, SSL Up
+def SSL(data, period=20, out=None):
+    high_sma = _series(_col(data, 'High')).rolling(window=period).mean().to_numpy()
+    low_sma = _series(_col(data, 'Low')).rolling(window=period).mean().to_numpy()
+    close = _col(data, 'Close')
+    hi_lo = _series(np.where(close > high_sma, 1, np.where(close < low_sma, -1, np.nan))).ffill().to_numpy()
+    return _write(_out(out, len(data), 2), np.where(hi_lo < 0, high_sma, low_sma), np.where(hi_lo < 0, low_sma, high_sma))
+
+# SuperTrend
+def SuperTrend(data, multiplier=3, period=10, out=None):
+    st = SuperTrend_array(_col(data, 'High'), _col(data, 'Low'), _col(data, 'Close'), multiplier, period)
+    return _write(_out(out, len(data)), st)
+
+# On Balance Volume (OBV)
+def OBV(data, out=None):
+    daily_ret = _series(_col(data, 'Close')).pct_change().to_numpy()
+    direction = np.where(daily_ret >= 0, 1, -1)
+    direction[0] = 0
+    return _write(_out(out, len(data)), np.cumsum(_col(data, 'Volume') * direction))
+
+# Average Directional Index (ADX), needs the 'ATR' column
+def ADX(data, period=14, out=None):
+    high, low = _series(_col(data, 'High')), _series(_col(data, 'Low'))
+    atr = _col(data, 'ATR')
+    upmove = (high - high.shift(1)).to_numpy()
+    downmove = (low.shift(1) - low).to_numpy()
+    plus_dm = np.where((upmove > downmove) & (upmove > 0), upmove, 0)
+    minus_dm = np.where((downmove > upmove) & (downmove > 0), downmove, 0)
+    plus_di = 100 * _series(plus_dm/atr).ewm(alpha=1/period, min_periods=period).mean()
+    minus_di = 100 * _series(minus_dm/atr).ewm(alpha=1/period, min_periods=period).mean()
+    adx = 100* abs((plus_di - minus_di)/(plus_di + minus_di)).ewm(alpha=1/period, min_periods=period).mean()
+    return _write(_out(out, len(data)), adx.to_numpy())
+
+# ---------- memory benchmark ----------
+
+# one ticker with n_extra indicator-like columns already attached, as in a long notebook session
+def _wide_frame(n_bars, n_extra, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n_bars)))
+    data = {'Open': close * (1 + rng.normal(0, 0.002, n_bars)), 'High': close * 1.01, 'Low': close * 0.99,
+            'Close': close, 'Volume': rng.integers(1e5, 1e6, n_bars).astype(float)}
+    data.update({f'extra {j}': close for j in range(n_extra)})
+    return pd.DataFrame(data, index=pd.bdate_range('2000-01-03', periods=n_bars))
+
+# indicators of the multistock notebook for every ticker, with the copying or the zero-copy functions
+def _universe_run(mode, n_tickers, n_bars, n_extra):
+    import resource
+    import TA_indicators_v2_1 as ta
+    frames = [_wide_frame(n_bars, n_extra, seed) for seed in range(n_tickers)]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # both versions keep their 7 indicator columns per ticker
+    results = []
+    for df in frames:
+        if mode == 'copy':
+            df[['True Range','ATR']] = ta.ATR(df)
+            df['EMA'] = ta.EMA(df,20)
+            df[['SSL Down','SSL Up']] = ta.SSL(df,20)
+            df[['VI+','VI-']] = ta.vortex(df,10)
+        else:
+            out = np.empty((n_bars, 7))
+            ATR(df, out=out[:, 0:2])
+            EMA(df, 20, out=out[:, 2])
+            SSL(df, 20, out=out[:, 3:5])
+            vortex(df, 10, out=out[:, 5:7])
+            results.append(out)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return {'mode': mode, 'baseline MB': baseline * scale / 2**20, 'peak MB': peak * scale / 2**20,
+            'increase MB': (peak - baseline) * scale / 2**20}
+
+# peak RSS of the same universe run with TA_indicators_v2_1 ('copy') and with this module ('views'),
+# each in a fresh process so that the peaks don't mix
+def memory_benchmark(n_tickers=50, n_bars=5000, n_extra=40):
+    results = []
+    for mode in ('copy', 'views'):
+        code = (f'import json, TA_views_v1_0 as tav; '
+                f'print(json.dumps(tav._universe_run({mode!r}, {n_tickers}, {n_bars}, {n_extra})))')
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return pd.DataFrame(results).set_index('mode')
+
+if __name__ == '__main__':
+    print(memory_benchmark(*[int(a) for a in sys.argv[1:4]]))
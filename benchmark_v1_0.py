@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import TA_indicators_v2_1 as ta
+from long_short_screen_v1_3 import long_short_screen, calculateMaxDD
+from multistock_runner_v1_0 import ema_vortex_ssl_strategy, run_universe
+
+# Benchmark suite for the indicators, the screener & the multistock runner, on synthetic OHLCV data (no download).
+#
+# Every case is timed (median of `repeat` runs of at least 0.2 s) and then run once more under tracemalloc for its
+# peak memory; the throughput is bars per second over all tickers. The results can be saved as a baseline (a JSON
+# file) and later runs are compared with it: a case fails when its time or peak memory is more than `threshold`
+# (relative) above the baseline, its time also by more than `noise_floor` seconds. Baselines are only comparable on
+# the same machine.
+#
+#     python benchmark_v1_0.py --save-baseline                 # record benchmark_baseline.json
+#     python benchmark_v1_0.py --check                         # exit code 1 if a case regressed
+#     python benchmark_v1_0.py --bars 1000 10000 --tickers 1 50 --threshold 0.3 --check      # smaller & quicker
+
+BARS = (1_000, 10_000, 1_000_000)
+TICKERS = (1, 50, 500)
+# bars per ticker of the multistock runs
+UNIVERSE_BARS = 1_000
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# indicator name -> call on an OHLCV frame (CHOP & vortex need the True Range column and ADX the ATR column,
+# added to the frame beforehand)
+INDICATORS = {
+    'bollinger': lambda df: ta.bollinger(df, 20),
+    'RSI': lambda df: ta.RSI(df, 14),
+    'EMA': lambda df: ta.EMA(df, 20),
+    'WMA': lambda df: ta.WMA(df, 20),
+    'MACD': lambda df: ta.MACD(df),
+    'CMF': lambda df: ta.CMF(df, 20),
+    'ATR': lambda df: ta.ATR(df, 14),
+    'CHOP': lambda df: ta.CHOP(df, 14),
+    'vortex': lambda df: ta.vortex(df, 10),
+    'SSL': lambda df: ta.SSL(df, 20),
+    'SuperTrend': lambda df: ta.SuperTrend(df, 3, 10),
+    'OBV': lambda df: ta.OBV(df),
+    'ADX': lambda df: ta.ADX(df, 14),
+}
+
+# ---------- synthetic data ----------
+
+# reproducible OHLCV frame: geometric random walk for the close, opening gaps, highs & lows around the
+# open/close and log-normal volumes. Business days up to 50k bars, minute bars beyond (to stay in the
+# range of pandas timestamps).
+def synthetic_ohlcv(n_bars, seed=0, start='2000-01-03', freq=None, volatility=0.015):
+    rng = np.random.default_rng(seed)
+    freq = ('B' if n_bars <= 50_000 else 'min') if freq is None else freq
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0002, volatility, n_bars)))
+    prev_close = np.concatenate([[close[0]], close[:-1]])
+    open_price = prev_close * np.exp(rng.normal(0, volatility / 4, n_bars))
+    high = np.maximum(open_price, close) * np.exp(np.abs(rng.normal(0, volatility / 2, n_bars)))
+    low = np.minimum(open_price, close) * np.exp(-np.abs(rng.normal(0, volatility / 2, n_bars)))
+    volume = np.round(rng.lognormal(13, 0.5, n_bars))
+    return pd.DataFrame({'Open': open_price, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=pd.date_range(start, periods=n_bars, freq=freq, name='Date'))
+
+# dictionary of ticker -> synthetic OHLCV frame, each ticker with its own seed
+def synthetic_universe(n_bars, n_tickers, seed=0, **kwargs):
+    return {f'SYN{j:04d}': synthetic_ohlcv(n_bars, seed=seed + j, **kwargs) for j in range(n_tickers)}
+
+# ---------- measurement ----------
+
+# median time per call over `repeat` runs; fast cases are called several times per run (at least min_seconds
+# per run, as timeit does) so that timer resolution & noise don't trip the regression threshold
+def _time(func, repeat, min_seconds=0.2):
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    loops = max(1, int(np.ceil(min_seconds / max(first, 1e-9))))
+    # a single call long enough counts as the first run
+    times = [first] if loops == 1 else []
+    while len(times) < max(repeat, 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        times.append((time.perf_counter() - start) / loops)
+    return float(np.median(times))
+
+def _peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def measure(name, func, n_bars, n_tickers=1, repeat=3, memory=True):
+    seconds = _time(func, repeat)
+    result = {'case': f'{name} {n_bars}x{n_tickers}', 'name': name, 'bars': n_bars, 'tickers': n_tickers,
+              'seconds': seconds, 'bars per second': n_bars * n_tickers / seconds}
+    result['peak MB'] = _peak_memory(func) / 2**20 if memory else np.nan
+    return result
+
+# ---------- cases ----------
+
+def _screener_inputs(df):
+    df = df.copy()
+    df['Percent Change'] = df['Close'].pct_change()
+    signals = ema_vortex_ssl_strategy(df)
+    return df, signals
+
+def indicator_cases(bars=BARS, repeat=3, memory=True):
+    results = []
+    for n_bars in bars:
+        df = synthetic_ohlcv(n_bars)
+        df[['True Range','ATR']] = ta.ATR(df)
+        for name, func in INDICATORS.items():
+            results.append(measure(name, lambda: func(df), n_bars, 1, repeat, memory))
+    return results
+
+def screener_cases(bars=BARS, repeat=3, memory=True):
+    results = []
+    for n_bars in bars:
+        df, signals = _screener_inputs(synthetic_ohlcv(n_bars))
+        results.append(measure('long_short_screen', lambda: long_short_screen(df, *signals, 0.005, 0.05),
+                               n_bars, 1, repeat, memory))
+        cumret = long_short_screen(df, *signals, 0.005, 0.05)[0]['Equity - Long & Short'].to_numpy()
+        results.append(measure('calculateMaxDD', lambda: calculateMaxDD(cumret), n_bars, 1, repeat, memory))
+    return results
+
+# full multistock runs (indicators, signals & screener per ticker). workers=1 by default so that the timings
+# don't depend on the number of cores and the peak memory covers the whole run (tracemalloc can't see workers).
+def universe_cases(tickers=TICKERS, n_bars=UNIVERSE_BARS, repeat=1, memory=True, workers=1):
+    results = []
+    for n_tickers in tickers:
+        frames = synthetic_universe(n_bars, n_tickers)
+        results.append(measure('run_universe', lambda: run_universe(frames, workers=workers), n_bars, n_tickers,
+                               repeat, memory))
+    return results
+
+def run_suite(bars=BARS, tickers=TICKERS, universe_bars=UNIVERSE_BARS, repeat=3, memory=True, workers=1):
+    results = indicator_cases(bars, repeat, memory) + screener_cases(bars, repeat, memory)
+    results += universe_cases(tickers, universe_bars, repeat, memory, workers)
+    return pd.DataFrame(results).set_index('case')
+
+# ---------- baseline ----------
+
+def save_baseline(results, path=BASELINE):
+    baseline = {'python': sys.version.split()[0], 'numpy': np.__version__, 'pandas': pd.__version__,
+                'machine': platform.platform(), 'cases': results.reset_index().to_dict(orient='records')}
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=1)
+
+def load_baseline(path=BASELINE):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'no baseline at {path}: run python benchmark_v1_0.py --save-baseline first')
+    with open(path) as f:
+        return pd.DataFrame(json.load(f)['cases']).set_index('case')
+
+# compare results with a baseline: the relative change of the time & peak memory of each case found in both,
+# and whether it is more than threshold (0.5 = 50% slower or bigger). Timings can vary by tens of percent
+# between runs on a busy machine, so record the baseline and check on a quiet one; a case is only slower when it
+# also takes more than noise_floor seconds per call longer (the timings of sub-millisecond cases are mostly noise).
+def compare(results, baseline, threshold=0.5, noise_floor=0.005):
+    cases = results.index.intersection(baseline.index)
+    comparison = pd.DataFrame({'seconds': results.loc[cases, 'seconds'],
+                               'baseline seconds': baseline.loc[cases, 'seconds'],
+                               'peak MB': results.loc[cases, 'peak MB'],
+                               'baseline peak MB': baseline.loc[cases, 'peak MB']})
+    comparison['time change'] = comparison['seconds'] / comparison['baseline seconds'] - 1
+    comparison['memory change'] = comparison['peak MB'] / comparison['baseline peak MB'] - 1
+    slower = (comparison['time change'] > threshold) & (comparison['seconds'] - comparison['baseline seconds'] > noise_floor)
+    # NaN memory (not measured) never fails
+    comparison['regressed'] = slower | (comparison['memory change'] > threshold)
+    return comparison
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the indicators, the screener and the multistock runner.')
+    parser.add_argument('--bars', type=int, nargs='+', default=list(BARS))
+    parser.add_argument('--tickers', type=int, nargs='+', default=list(TICKERS))
+    parser.add_argument('--universe-bars', type=int, default=UNIVERSE_BARS)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory runs')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--noise-floor', type=float, default=0.005, help='seconds per call below which slowdowns are ignored')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--check', action='store_true', help='exit with code 1 if a case regressed')
+    parser.add_argument('--output', help='also write the results to this CSV file')
+    args = parser.parse_args(argv)
+    # checked before the (long) benchmark runs
+    if args.check and not args.save_baseline and not os.path.exists(args.baseline):
+        parser.error(f'no baseline at {args.baseline}: run with --save-baseline first')
+
+    results = run_suite(args.bars, args.tickers, args.universe_bars, args.repeat, not args.no_memory, args.workers)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(results.drop(columns=['name','bars','tickers']))
+    if args.output:
+        results.to_csv(args.output)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f'baseline saved to {args.baseline}')
+    if args.check:
+        comparison = compare(results, load_baseline(args.baseline), args.threshold, args.noise_floor)
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(comparison)
+        regressed = comparison.index[comparison['regressed']]
+        if len(regressed):
+            print(f'{len(regressed)} case(s) regressed by more than {args.threshold:.0%}: ' + ', '.join(regressed))
+            return 1
+        print(f'no regression beyond {args.threshold:.0%} on {len(comparison)} case(s)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from pipeline_profiler_v1_0 import PipelineProfiler, stage
+
+# Batch rendering of the equity curve charts of multistock_backtester.ipynb, as a separate stage after the
+# screening (e.g. on the equity dictionary returned by run_universe):
+#
+#     summary, equity = run_universe(frames)
+#     render_equity_charts(equity, 'stocks_equity_curve', summary=summary, top=10, bottom=10)
+#
+# The charts are drawn with the Agg canvas directly (matplotlib.figure.Figure, no pyplot / GUI backend), on a pool
+# of worker processes; each worker creates one figure and reuses it for all its charts, only replacing the data of
+# the three lines. A hash of each ticker's equity curves is kept in <directory>/.equity_hashes.json, so charts whose
+# data hasn't changed since they were last rendered are skipped (only_changed=False renders them all again).
+
+CHART_STYLE = 1  # part of the hashes: bump it when the chart layout changes so that all charts are re-rendered
+HASH_FILE = '.equity_hashes.json'
+CURVES = (('Equity - Long','Long'), ('Equity - Short','Short'), ('Equity - Long & Short','Long & Short'))
+
+def equity_hash(ticker, equity):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{CHART_STYLE} {ticker}'.encode())
+    h.update(pd.util.hash_pandas_object(equity.index).to_numpy().view(np.uint8))
+    for column, _ in CURVES:
+        h.update(np.ascontiguousarray(equity[column].to_numpy(dtype=np.float64)).view(np.uint8))
+    return h.hexdigest()
+
+# tickers to render: all of them, or the top / bottom N by Sharpe ratio (summary as returned by run_universe)
+def select_tickers(tickers, summary=None, top=None, bottom=None):
+    if top is None and bottom is None:
+        return list(tickers)
+    if summary is None:
+        raise ValueError('top / bottom selection needs the KPI summary')
+    sharpe = summary['Sharpe Ratio'].reindex(list(tickers)).dropna().sort_values(ascending=False)
+    selected = list(sharpe.index[:top or 0]) + list(sharpe.index[len(sharpe) - (bottom or 0):])
+    return list(dict.fromkeys(selected))
+
+# ---------- workers ----------
+
+# state of the current process (a worker, or this process for the serial run)
+_renderer = {}
+
+def _init_renderer(profiler_options):
+    _renderer.update(figure=None, profiler=None if profiler_options is None else PipelineProfiler(**profiler_options))
+
+def _new_figure():
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(8,6))
+    ax = fig.subplots()
+    return fig, ax
+
+def _render(ticker, index, curves, path):
+    if _renderer['figure'] is None:
+        fig, ax = _new_figure()
+        lines = [ax.plot(index, values, label=label)[0] for values, (_, label) in zip(curves, CURVES)]
+        ax.legend()
+        ax.set_ylabel('Equity')
+        _renderer['figure'] = fig, ax, lines
+    else:
+        fig, ax, lines = _renderer['figure']
+        for line, values in zip(lines, curves):
+            line.set_data(index, values)
+        ax.relim()
+        ax.autoscale_view()
+    ax.set_title(f'{ticker}')
+    fig.savefig(path)
+
+def _render_chunk(tasks):
+    profiler = _renderer['profiler']
+    for ticker, index, curves, path in tasks:
+        with stage(profiler, 'charts', ticker):
+            _render(ticker, index, curves, path)
+    return None if profiler is None else profiler.export()
+
+# ---------- rendering ----------
+
+# render <directory>/<ticker>.png for the selected tickers of equity (dictionary of ticker -> equity curves).
+# skip=True renders nothing (the charts on disk are left as they are), top / bottom select the best & worst
+# tickers by Sharpe ratio, workers: number of processes (None = all cores, 1 = in this process).
+# returns a dictionary of ticker -> path of the charts that were (re-)rendered.
+def render_equity_charts(equity, directory='stocks_equity_curve', summary=None, top=None, bottom=None, skip=False,
+                         only_changed=True, workers=None, chunksize=None, profiler=None):
+    if skip:
+        return {}
+    os.makedirs(directory, exist_ok=True)
+    hash_path = os.path.join(directory, HASH_FILE)
+    hashes = {}
+    if os.path.exists(hash_path):
+        with open(hash_path) as f:
+            hashes = json.load(f)
+
+    tasks, new_hashes = [], {}
+    for ticker in select_tickers(equity.keys(), summary, top, bottom):
+        path = os.path.join(directory, f'{ticker}.png')
+        new_hashes[ticker] = equity_hash(ticker, equity[ticker])
+        if only_changed and hashes.get(ticker) == new_hashes[ticker] and os.path.exists(path):
+            continue
+        curves = [equity[ticker][column].to_numpy(dtype=np.float64) for column, _ in CURVES]
+        tasks.append((ticker, equity[ticker].index.to_numpy(), curves, path))
+
+    if tasks:
+        workers = os.cpu_count() if workers is None else max(1, workers)
+        workers = min(workers, len(tasks))
+        if chunksize is None:
+            chunksize = max(1, int(np.ceil(len(tasks) / (4 * workers))))
+        chunks = [tasks[i:i + chunksize] for i in range(0, len(tasks), chunksize)]
+        profiler_options = None if profiler is None else profiler.options
+        if workers == 1:
+            _init_renderer(profiler_options)
+            try:
+                profiles = [_render_chunk(chunk) for chunk in chunks]
+            finally:
+                _renderer.clear()
+        else:
+            with Pool(workers, initializer=_init_renderer, initargs=(profiler_options,)) as pool:
+                profiles = pool.map(_render_chunk, chunks, chunksize=1)
+        if profiler is not None:
+            for profile in profiles:
+                profiler.merge(profile)
+
+    # keep the hashes of the tickers not rendered this time
+    hashes.update({ticker: new_hashes[ticker] for ticker, _, _, _ in tasks})
+    with open(hash_path, 'w') as f:
+        json.dump(hashes, f, indent=0, sort_keys=True)
+    return {ticker: path for ticker, _, _, path in tasks}
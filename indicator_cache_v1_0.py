@@ -0,0 +1,124 @@
+import hashlib
+import inspect
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import TA_indicators_v2_1 as ta
+
+# Memoizing cache in front of TA_indicators_v2_1.
+#
+# Results are keyed by (content hash of the input columns the indicator reads, directly or through its
+# dependencies, indicator, parameters), so the same indicator on the same prices is only computed once, whatever
+# DataFrame the prices come in. Indicators declare their dependencies (CHOP & vortex need the True Range, ADX the
+# ATR, SuperTrend the ATR of its period), which are taken from the cache as well, so shared inputs are computed
+# once. Entries are evicted least recently used first when the cached results exceed the memory budget.
+#
+#     cache = IndicatorCache(max_bytes=256 * 2**20)
+#     df['EMA'] = cache.get(df, 'EMA', period=20)
+#     df[['VI+','VI-']] = cache.get(df, 'vortex', period=10)   # computes (and caches) the ATR's True Range first
+#     cache.stats()
+
+def _supertrend(data, multiplier=3, period=10):
+    st = ta.SuperTrend_array(data['High'], data['Low'], data['Close'], multiplier, period, atr=data['ATR'])
+    return pd.Series(st, index=data.index, name='SuperTrend')
+
+def _adx(data, period=14, atr_period=14):
+    return ta.ADX(data, period)
+
+# indicator name -> (function, input columns, dependencies(params) -> [(indicator, params, output column)])
+# the default ATR period of 14 is the one used by the notebooks before calling CHOP / vortex / ADX
+INDICATORS = {
+    'bollinger': (ta.bollinger, ('Close',), None),
+    'RSI': (ta.RSI, ('Close',), None),
+    'EMA': (ta.EMA, ('Close',), None),
+    'WMA': (ta.WMA, ('Close',), None),
+    'MACD': (ta.MACD, ('Close',), None),
+    'CMF': (ta.CMF, ('High','Low','Close','Volume'), None),
+    'ATR': (ta.ATR, ('High','Low','Close'), None),
+    'CHOP': (ta.CHOP, ('High','Low'), lambda p: [('ATR', {'period': 14}, 'True Range')]),
+    'vortex': (ta.vortex, ('High','Low'), lambda p: [('ATR', {'period': 14}, 'True Range')]),
+    'SSL': (ta.SSL, ('High','Low','Close'), None),
+    'SuperTrend': (_supertrend, ('High','Low','Close'), lambda p: [('ATR', {'period': p.get('period', 10)}, 'ATR')]),
+    'OBV': (ta.OBV, ('Close','Volume'), None),
+    'ADX': (_adx, ('High','Low'), lambda p: [('ATR', {'period': p.get('atr_period', 14)}, 'ATR')]),
+}
+
+def _nbytes(result):
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=True).sum())
+    return int(result.memory_usage(index=True))
+
+class IndicatorCache:
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # content hash of some columns of data (values & dates)
+    def key_for(self, data, columns):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(pd.util.hash_pandas_object(data.index).to_numpy().view(np.uint8))
+        for column in columns:
+            h.update(column.encode())
+            h.update(np.ascontiguousarray(data[column].to_numpy(dtype=np.float64)).view(np.uint8))
+        return h.hexdigest()
+
+    # the indicator as returned by TA_indicators_v2_1, e.g. get(df, 'SSL', period=20).
+    # the result is a copy, so it can be modified without affecting the cache.
+    def get(self, data, indicator, **params):
+        return self._get(data, indicator, params).copy()
+
+    # input columns of an indicator and of its dependencies (e.g. vortex reads Close through the True Range)
+    def _columns(self, indicator, params):
+        _, columns, dependencies = INDICATORS[indicator]
+        columns = list(columns)
+        for dep_indicator, dep_params, _ in (dependencies(params) if dependencies else []):
+            columns += [c for c in self._columns(dep_indicator, dep_params) if c not in columns]
+        return columns
+
+    def _get(self, data, indicator, params):
+        func, columns, dependencies = INDICATORS[indicator]
+        # fill in the default parameters so that get(df, 'EMA') and get(df, 'EMA', period=20) share an entry
+        bound = inspect.signature(func).bind(None, **params)
+        bound.apply_defaults()
+        params = dict(list(bound.arguments.items())[1:])
+        # the dependencies' parameters follow from params, their columns are part of the key
+        key = (self.key_for(data, self._columns(indicator, params)), indicator, tuple(sorted(params.items())))
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        inputs = data[list(columns)].copy()
+        for dep_indicator, dep_params, dep_column in (dependencies(params) if dependencies else []):
+            inputs[dep_column] = self._get(data, dep_indicator, dep_params)[dep_column]
+        result = func(inputs, **params)
+        self._store(key, result)
+        return result
+
+    def _store(self, key, result):
+        size = _nbytes(result)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = result
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, old = self.entries.popitem(last=False)
+            self.nbytes -= _nbytes(old)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries), 'bytes': self.nbytes, 'max bytes': self.max_bytes}
@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from long_short_screen_v1_3 import position_tracker, leg_returns, infer_bars_per_year
+from ohlcv_store_v1_0 import load_columns, stored_bars
+from signal_rules_v1_0 import EMA_VORTEX_SSL_RULES
+
+# Out-of-core screening of long histories of intraday (hourly, minute ...) bars with the EMA / vortex / SSL
+# strategy of the multistock backtester.
+#
+# The bars are processed in chunks (e.g. streamed from the memory-mapped files of ohlcv_store_v1_0), carrying the
+# state of the indicators (last EMA value, the last window of each rolling sum, the SSL state), of the position
+# trackers and of the KPIs from one chunk to the next, so the memory stays flat whatever the length of the history.
+# The last bar of each chunk is held back until the next chunk arrives, because its exit-day adjustment depends on
+# the position on the following bar.
+# The equity curves are optionally written to a raw float64 file (bars x 3: long, short, long & short).
+#
+# The chunk size doesn't change the trackers, returns & equity curves (bit for bit). Compared with an in-memory
+# long_short_screen of the same strategy, the rolling sums are computed window by window here instead of pandas'
+# running sums, so indicator values can differ in the last bits (the trades only differ if a signal is an exact
+# tie); the Sharpe ratio's mean & variance are merged chunk by chunk, equal to rounding.
+# The KPIs are annualised with bars_per_year, given to screen_chunks; intraday_screen infers it from all the dates
+# of the stored history by default (not from a chunk, which would make the results depend on the chunk size).
+
+# ewm(span, adjust=False) continued from the last value of the previous chunk (NaN for the first period - 1 bars)
+class _ChunkEMA:
+    def __init__(self, period):
+        self.period, self.last, self.count = period, None, 0
+
+    def update(self, x):
+        seeded = x if self.last is None else np.concatenate([[self.last], x])
+        ema = pd.Series(seeded).ewm(span=self.period, adjust=False).mean().to_numpy()
+        ema = ema if self.last is None else ema[1:]
+        self.last = ema[-1]
+        bars = self.count + np.arange(len(x))
+        self.count += len(x)
+        return np.where(bars >= self.period - 1, ema, np.nan)
+
+# rolling sum (or mean) of complete windows, with the last window - 1 values of the previous chunk
+class _ChunkRolling:
+    def __init__(self, window, mean=False):
+        self.window, self.mean = window, mean
+        self.tail = np.full(window - 1, np.nan)
+
+    def update(self, x):
+        values = np.concatenate([self.tail, x])
+        self.tail = values[len(values) - (self.window - 1):] if self.window > 1 else values[:0]
+        sums = sliding_window_view(values, self.window).sum(axis=1)
+        return sums / self.window if self.mean else sums
+
+# running KPIs of long_short_screen's screen_kpis & calculateMaxDD
+class _ChunkKPIs:
+    def __init__(self, bars_per_year):
+        self.bars_per_year = bars_per_year
+        self.equity_long = self.equity_short = 1.0
+        self.n = 0
+        self.highwatermark = 0.0
+        self.maxDD, self.maxDDDay, self.maxDDD, self.last_peak = 0.0, 0, 0.0, 0
+        self.mean, self.m2 = 0.0, 0.0
+
+    def update(self, pct_change_long, pct_change_short):
+        equity_long = np.cumprod(np.concatenate([[self.equity_long], 1 + pct_change_long]))[1:]
+        equity_short = np.cumprod(np.concatenate([[self.equity_short], 1 + pct_change_short]))[1:]
+        equity_net = 0.5 * (equity_long + equity_short)
+        self.equity_long, self.equity_short = equity_long[-1], equity_short[-1]
+        bars = self.n + np.arange(len(equity_net))
+
+        # calculateMaxDD: the high watermark starts at 0 on the first bar, drawdown 0 on the first bar
+        cumret = np.where(bars == 0, 0, np.maximum(equity_net, 0))
+        highwatermark = np.maximum.accumulate(np.concatenate([[self.highwatermark], cumret]))[1:]
+        drawdown = (1+equity_net)/(1+highwatermark)-1
+        drawdown[bars == 0] = 0
+        self.highwatermark = highwatermark[-1]
+        i = np.argmin(drawdown)
+        if drawdown[i] < self.maxDD:
+            self.maxDD, self.maxDDDay = drawdown[i], self.n + i
+        last_peak = np.maximum.accumulate(np.concatenate([[self.last_peak], np.where(drawdown != 0, 0, bars)]))[1:]
+        self.maxDDD = max(self.maxDDD, float(np.max(bars - last_peak)))
+        self.last_peak = last_peak[-1]
+
+        # mean & variance of the excess returns, merged with the previous chunks
+        excessRet = 0.5 * (pct_change_long + pct_change_short) - (0.025/self.bars_per_year)
+        n, mean = len(excessRet), np.mean(excessRet)
+        m2 = np.sum((excessRet - mean)**2)
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta**2 * self.n * n / total
+        self.n = total
+        return equity_long, equity_short, equity_net
+
+    def result(self):
+        sharpeRatio = np.sqrt(self.bars_per_year) * self.mean / np.sqrt(self.m2 / self.n)
+        equity_net = 0.5 * (self.equity_long + self.equity_short)
+        cagr = equity_net**(1/(self.n/self.bars_per_year))-1
+        return self.maxDD, self.maxDDD, self.maxDDDay, sharpeRatio, cagr
+
+class _ChunkScreen:
+    def __init__(self, spread, fees, bars_per_year, ema_period, ssl_period, vortex_period, rules, equity_file):
+        self.spread, self.fees, self.bars_per_year, self.rules = spread, fees, bars_per_year, rules
+        self.ema = _ChunkEMA(ema_period)
+        self.high_sma, self.low_sma = _ChunkRolling(ssl_period, mean=True), _ChunkRolling(ssl_period, mean=True)
+        self.plus_VM, self.minus_VM, self.sum_TR = (_ChunkRolling(vortex_period) for _ in range(3))
+        self.prev = {'High': np.nan, 'Low': np.nan, 'Close': np.nan}
+        self.hi_lo = np.nan
+        self.signal_position = {1: 0, -1: 0}
+        # tracker values of the last processed bar
+        self.before = {'long': 0, 'short': 0}
+        # the held-back last bar: its tracker values, percent change, open & close, and the close before it
+        self.pending = None
+        self.kpis = None
+        self.equity_file = equity_file
+        self.maxDD_date = None
+
+    def _indicators(self, o, h, l, c):
+        prev_high, prev_low, prev_close = (np.concatenate([[self.prev[f]], x[:-1]]) for f, x in
+                                           (('High', h), ('Low', l), ('Close', c)))
+        self.prev = {'High': h[-1], 'Low': l[-1], 'Close': c[-1]}
+
+        true_range = np.fmax(np.fmax(h - l, np.abs(h - prev_close)), np.abs(l - prev_close))
+        sum_TR = self.sum_TR.update(true_range)
+        vi_plus = self.plus_VM.update(np.abs(h - prev_low)) / sum_TR
+        vi_minus = self.minus_VM.update(np.abs(l - prev_high)) / sum_TR
+
+        high_sma, low_sma = self.high_sma.update(h), self.low_sma.update(l)
+        hi_lo = pd.Series(np.concatenate([[self.hi_lo], np.where(c > high_sma, 1, np.where(c < low_sma, -1, np.nan))]))
+        hi_lo = hi_lo.ffill().to_numpy()[1:]
+        self.hi_lo = hi_lo[-1]
+        ssl_down, ssl_up = np.where(hi_lo < 0, high_sma, low_sma), np.where(hi_lo < 0, low_sma, high_sma)
+
+        return {'Close': c, 'EMA': self.ema.update(c), 'VI+': vi_plus, 'VI-': vi_minus,
+                'SSL Up': ssl_up, 'SSL Down': ssl_down}, prev_close
+
+    def _trackers(self, signals):
+        trackers = {}
+        for position, entry, exit in ((1, signals[0], signals[1]), (-1, signals[2], signals[3])):
+            # one extra bar gives the unshifted position after the last bar, carried to the next chunk
+            tracker = position_tracker(np.append(entry, False), np.append(exit, False), position,
+                                       before=self.signal_position[position])
+            self.signal_position[position] = tracker[-1]
+            trackers[position] = tracker[:-1]
+        return trackers
+
+    def update(self, chunk):
+        if self.kpis is None:
+            self.kpis = _ChunkKPIs(self.bars_per_year)
+        o, h, l, c = (chunk[f].to_numpy(dtype=float) for f in ('Open','High','Low','Close'))
+        columns, prev_close = self._indicators(o, h, l, c)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pct_change = c / prev_close - 1
+        trackers = self._trackers(self.rules.signals(columns))
+
+        bars = {'long': trackers[1], 'short': trackers[-1], 'pct': pct_change, 'open': o, 'close': c,
+                'prev_close': prev_close, 'date': chunk.index.values}
+        if self.pending is not None:
+            bars = {k: np.concatenate([self.pending[k], v]) for k, v in bars.items()}
+        # hold back the last bar
+        self.pending = {k: v[-1:] for k, v in bars.items()}
+        ready = {k: v[:-1] for k, v in bars.items()}
+        self._process(ready, {'long': bars['long'][-1], 'short': bars['short'][-1]})
+
+    def _process(self, bars, after):
+        if len(bars['pct']) == 0:
+            return
+        legs = {}
+        for leg, position in (('long', 1), ('short', -1)):
+            before = self.before[leg]
+            legs[leg] = leg_returns(bars[leg], position, bars['pct'], bars['open'], bars['close'], self.spread, self.fees,
+                                    self.bars_per_year, before_tracker=before, after_tracker=after[leg],
+                                    before_close=bars['prev_close'][0])
+        self.before = {'long': bars['long'][-1], 'short': bars['short'][-1]}
+        offset, maxDDDay = self.kpis.n, self.kpis.maxDDDay
+        equity = self.kpis.update(legs['long'], legs['short'])
+        if self.kpis.maxDDDay != maxDDDay or offset == 0:
+            self.maxDD_date = bars['date'][self.kpis.maxDDDay - offset]
+        if self.equity_file is not None:
+            self.equity_file.write(np.column_stack(equity).tobytes())
+
+    def finish(self):
+        if self.pending is not None:
+            # the last bar of the history: still in position after it, as in leg_returns
+            self._process(self.pending, {'long': 1, 'short': -1})
+            self.pending = None
+        maxDD, maxDDD, _, sharpeRatio, cagr = self.kpis.result()
+        return maxDD, maxDDD, str(pd.Timestamp(self.maxDD_date))[:10], sharpeRatio, cagr
+
+# screen an iterable of OHLC DataFrame chunks (consecutive, in date order), returns
+# (max drawdown, max drawdown duration, max drawdown date, Sharpe ratio, CAGR) as long_short_screen.
+# bars_per_year is required: the chunks only show part of the dates (see infer_bars_per_year for the whole history).
+# equity_path: optional raw float64 file receiving the equity curves (bars x 3), see load_equity.
+def screen_chunks(chunks, spread=0.005, fees=0.05, bars_per_year=None, ema_period=20, ssl_period=20, vortex_period=10,
+                  rules=EMA_VORTEX_SSL_RULES, equity_path=None):
+    if bars_per_year is None:
+        raise ValueError('bars_per_year is required to screen chunks (e.g. infer_bars_per_year of all the dates)')
+    equity_file = None if equity_path is None else open(equity_path, 'wb')
+    try:
+        screen = _ChunkScreen(spread, fees, bars_per_year, ema_period, ssl_period, vortex_period, rules, equity_file)
+        for chunk in chunks:
+            chunk = chunk[chunk['Close'].notna()]
+            if len(chunk):
+                screen.update(chunk)
+        if screen.kpis is None:
+            raise ValueError('no bars to screen')
+        return screen.finish()
+    finally:
+        if equity_file is not None:
+            equity_file.close()
+
+# chunks of chunk_bars bars of one ticker of the OHLCV store, read from its memory-mapped files
+def store_chunks(root, ticker, chunk_bars=100_000, fields=('Open','High','Low','Close')):
+    columns = load_columns(root, ticker, fields)
+    for start in range(0, stored_bars(root, ticker), chunk_bars):
+        rows = slice(start, start + chunk_bars)
+        yield pd.DataFrame({field: np.array(columns[field][rows]) for field in fields},
+                           index=pd.DatetimeIndex(columns['Date'][rows], name='Date'))
+
+# out-of-core screen of one ticker of the OHLCV store (see screen_chunks); bars_per_year defaults to the one inferred
+# from the memory-mapped dates of the whole stored history
+def intraday_screen(root, ticker, chunk_bars=100_000, spread=0.005, fees=0.05, bars_per_year=None, equity_path=None,
+                    **periods):
+    if bars_per_year is None:
+        bars_per_year = infer_bars_per_year(load_columns(root, ticker, ())['Date'])
+    return screen_chunks(store_chunks(root, ticker, chunk_bars), spread, fees, bars_per_year,
+                         equity_path=equity_path, **periods)
+
+# the equity curves written by screen_chunks, memory-mapped (bars x 3: long, short, long & short)
+def load_equity(path):
+    return np.memmap(path, dtype=np.float64, mode='r').reshape(-1, 3)
@@ -2,107 +2,259 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
-# the same as long_short_screen_v1_2 but since this is for the multi-stocks backtester,
-# there is no equity curves vizualization.
+# the screener engine used by the multi-stocks backtester (no equity curves vizualization);
+# long_short_screen_v1_2 wraps it and plots the equity curves for the single-stock backtester.
 
-def calculateMaxDD(cumret):
+# maximum drawdown, maximum drawdown duration & the bar of the maximum drawdown.
+# cumret can be 1-D or 2-D (bars x tickers / parameter sets, one equity curve per column),
+# for 2-D input each KPI is an array with one value per column.
+# with episodes=True a table of every drawdown episode is also returned: Start (first bar under water),
+# Trough, Recovery (first bar back at the high watermark, -1 if not recovered yet), Depth & Length (bars).
+def calculateMaxDD(cumret, episodes=False):
     # Original author: E.P. Chan (Quantitative Trading, 2nd Ed, 2021, Wiley)
-    highwatermark=np.zeros(cumret.shape)
-    drawdown=np.zeros(cumret.shape)
-    drawdownduration=np.zeros(cumret.shape)
-    
-    for t in np.arange(1, cumret.shape[0]):
-        highwatermark[t]=np.maximum(highwatermark[t-1], cumret[t])
-        drawdown[t]=(1+cumret[t])/(1+highwatermark[t])-1
-        if drawdown[t]==0:
-            drawdownduration[t]=0
-        else:
-            drawdownduration[t]=drawdownduration[t-1]+1
-             
-    maxDD, i=np.min(drawdown), np.argmin(drawdown) # drawdown < 0 always
-    maxDDD=np.max(drawdownduration)
-    return maxDD, maxDDD, i
-
-def long_short_screen(data, long_entry_signal, long_exit_signal, short_entry_signal, short_exit_signal, spread, fees):
-    df = data.copy()
-    
-    # ---------- LONG TRADES ----------
-    # first, initiate the position tracker (entry & exit signals are generated)
-    df['long_tracker'] = ''
-    # set position tracker as 1 at entry & set back to 0 upon selling
-    df['long_tracker'] = np.where(long_exit_signal, 0, np.nan)
-    df['long_tracker'] = np.where(long_entry_signal, 1, df['long_tracker'])
-    df['long_tracker'].ffill(inplace=True)
-    df['long_tracker'].fillna(0,inplace=True)
-    
-    # shift the position tracker to reflect a more realistic trading situation
-    # i.e. buy & sell the next day after the signal appears (beacuse signals are based on close price)
-    df['long_tracker'] = df['long_tracker'].shift()
-    df['long_tracker'].fillna(0,inplace=True)
-    
-    # calculate the percent price change when we're in position
-    df['pct_change_long'] = df['long_tracker'] * df['Percent Change']
-    df['pct_change_long'].fillna(0,inplace=True)
+    # vectorised with a running maximum instead of the original loop over bars (same values)
+    columns = cumret.columns if isinstance(cumret, pd.DataFrame) else None
+    cumret = np.asarray(cumret, dtype=float)
+    one_dim = cumret.ndim == 1
+    if one_dim:
+        cumret = cumret[:, None]
+    n = cumret.shape[0]
 
-    # change the pct_change to reflect price change from that day's open to that day's close:
-    for i in range(len(df)):
-        if (df['long_tracker'][i-1] == 0) and (df['long_tracker'][i] == 1):
-            df.iloc[i,-1] = (df['Close'][i] - df['Open'][i])/df['Open'][i]
+    # the high watermark starts at 0 on the first bar
+    highwatermark = np.maximum.accumulate(np.maximum(np.concatenate([np.zeros_like(cumret[:1]), cumret[1:]]), 0), axis=0)
+    drawdown = (1+cumret)/(1+highwatermark)-1
+    drawdown[0] = 0
 
-    # change the pct_change to reflect price change from yesterday's close to today's open (and including the fees):
-    for i in range(1,len(df)):
-        if (df['long_tracker'][i] == 0) and (df['long_tracker'][i-1] == 1):
-            df.iloc[i-1,-1] = ((df['Open'][i-1] - df['Close'][i-2])/df['Close'][i-2]) - spread
+    # duration = number of bars since the drawdown was last 0
+    underwater = drawdown != 0
+    bars = np.arange(n)[:, None]
+    last_peak = np.maximum.accumulate(np.where(underwater, 0, bars), axis=0)
+    drawdownduration = (bars - last_peak).astype(float)
 
-    # incorporate fees (financing costs)
-    df['pct_change_long'] = np.where(df['long_tracker'] == 1, df['pct_change_long'] - (fees/365),0)
+    maxDD, i=np.min(drawdown, axis=0), np.argmin(drawdown, axis=0) # drawdown < 0 always
+    maxDDD=np.max(drawdownduration, axis=0)
+    if one_dim:
+        maxDD, maxDDD, i = maxDD[0], maxDDD[0], i[0]
+    if not episodes:
+        return maxDD, maxDDD, i
+    return maxDD, maxDDD, i, drawdown_episodes(drawdown, underwater, columns, one_dim)
 
-    # calculate the equity curve for long trades
-    df['Equity - Long'] = (1 + df['pct_change_long']).cumprod()
+# one row per drawdown episode, from the run-lengths of the under-water bars (column by column)
+def drawdown_episodes(drawdown, underwater, columns=None, one_dim=False):
+    n, k = drawdown.shape
+    flat_dd = drawdown.T.ravel()
+    flat_uw = underwater.T.ravel()
 
-    #---------- SHORT TRADES ----------
-    # first, initiate the position tracker (entry & exit signals are generated)
-    df['short_tracker'] = ''
-    # set position tracker as -1 at entry & set back to 0 upon selling
-    df['short_tracker'] = np.where(short_exit_signal, 0, np.nan)
-    df['short_tracker'] = np.where(short_entry_signal, -1, df['short_tracker'])
-    df['short_tracker'].ffill(inplace=True)
-    df['short_tracker'].fillna(0,inplace=True)
-
-    # shift the position tracker to reflect a more realistic trading situation
-    # i.e. buy & sell the next day after the signal appears (beacuse signals are based on close price)
-    df['short_tracker'] = df['short_tracker'].shift()
-    df['short_tracker'].fillna(0,inplace=True)
+    # +1 where an episode starts, -1 on the bar it recovers (n if it doesn't), padded per column
+    padded = np.zeros((k, n + 2), dtype=np.int8)
+    padded[:, 1:-1] = underwater.T
+    change = np.diff(padded, axis=1)
+    col, start = np.nonzero(change == 1)
+    recovery = np.nonzero(change == -1)[1]
+    length = recovery - start
+
+    # depth: bars outside an episode have a drawdown of 0, so each reduceat segment's minimum is its episode's
+    flat_start = col * n + start
+    depth = np.minimum.reduceat(flat_dd, flat_start) if len(flat_start) else np.zeros(0)
+
+    # trough: first bar of each episode where the drawdown equals its depth
+    episode_start = np.zeros(n * k, dtype=int)
+    episode_start[flat_start] = 1
+    episode = np.cumsum(episode_start) - 1
+    at_depth = flat_uw & (episode >= 0)
+    at_depth[at_depth] = flat_dd[at_depth] == depth[episode[at_depth]]
+    found, first = np.unique(episode[at_depth], return_index=True)
+    trough = start.copy()
+    trough[found] = np.nonzero(at_depth)[0][first] - col[found] * n
+
+    table = pd.DataFrame({'Start': start, 'Trough': trough, 'Recovery': np.where(recovery < n, recovery, -1),
+                          'Depth': depth, 'Length': length})
+    if not one_dim:
+        table.insert(0, 'Column', col if columns is None else np.asarray(columns)[col])
+    return table
+
+# number of bars per year from the dates of the bars: 252 trading days per year times the median number of bars
+# per day for intraday bars (e.g. 252 * 390 for regular-session minute bars, the first & last days are left out
+# when they may be partial), 252 for daily bars and 365.25 / spacing in days for weekly or monthly bars
+def infer_bars_per_year(index):
+    dates = pd.DatetimeIndex(index)
+    spacing = np.median(np.diff(dates.asi8)) / 86400e9 if len(dates) > 1 else 1.0
+    if spacing < 1:
+        per_day = pd.Series(1, index=dates).groupby(dates.normalize()).size()
+        return 252 * float(np.median(per_day.iloc[1:-1] if len(per_day) > 2 else per_day))
+    if spacing <= 4:
+        return 252
+    return 365.25 / spacing
+
+# position tracker from entry & exit signals: `position` (1 long, -1 short) from an entry signal until the next exit signal.
+# the tracker is shifted by one bar to reflect a more realistic trading situation
+# i.e. buy & sell the next day after the signal appears (because signals are based on close price)
+# signals can be 1-D (bars) or 2-D (bars x tickers / parameter sets), the tracker is returned as int8
+# before: position from the signals before the first bar, for a chunk of a longer history (flat by default)
+def position_tracker(entry_signal, exit_signal, position, before=0):
+    entry_signal = np.asarray(entry_signal, dtype=bool)
+    exit_signal = np.asarray(exit_signal, dtype=bool)
+    tracker = np.where(entry_signal, position, np.where(exit_signal, 0, np.nan))
+
+    # forward fill the last signal, no signal yet means no position
+    bars = np.arange(tracker.shape[0]).reshape((-1,) + (1,) * (tracker.ndim - 1))
+    last_signal = np.maximum.accumulate(np.where(np.isnan(tracker), -1, bars), axis=0)
+    tracker = np.where(last_signal >= 0, np.take_along_axis(tracker, np.maximum(last_signal, 0), axis=0), before)
+
+    tracker = np.concatenate([np.full_like(tracker[:1], before), tracker[:-1]])
+    return tracker.astype(np.int8)
+
+# daily returns of one leg (long or short) given its position tracker, with the entry-day and exit-day adjustments,
+# the bid/ask spread and the financing costs. prices are 1-D and broadcast against a 2-D tracker.
+# bars_per_year: 252 for daily bars; the financing costs of a bar are those of a day scaled by 252/bars_per_year
+# for a chunk of a longer history, the tracker before its first bar & after its last bar and the close before its
+# first bar can be given (by default: flat before, still in position after & the wrapped-around last close)
+def leg_returns(tracker, position, pct_change, open_price, close_price, spread, fees, bars_per_year=252,
+                before_tracker=0, after_tracker=None, before_close=None):
+    tracker = np.asarray(tracker, dtype=float)
+    pct_change, open_price, close_price = (np.asarray(x, dtype=float) for x in (pct_change, open_price, close_price))
+    if tracker.ndim > pct_change.ndim:
+        pct_change, open_price, close_price = pct_change[:, None], open_price[:, None], close_price[:, None]
+
+    in_position = tracker == position
+    prev_tracker = np.concatenate([np.full_like(tracker[:1], before_tracker), tracker[:-1]])
+    next_tracker = np.concatenate([tracker[1:], np.full_like(tracker[:1], position if after_tracker is None else after_tracker)])
 
     # calculate the percent price change when we're in position
-    df['pct_change_short'] = df['short_tracker'] * df['Percent Change']
-    df['pct_change_short'].fillna(0,inplace=True)
+    pct = tracker * pct_change
+    pct = np.where(np.isnan(pct), 0, pct)
+
+    # the adjusted returns are computed for every bar but only used on entry & exit days
+    with np.errstate(divide='ignore', invalid='ignore'):
+        intraday_change = (close_price - open_price)/open_price
+        prev_close = np.roll(close_price, 1, axis=0)
+        if before_close is not None:
+            prev_close[0] = before_close
+        overnight_change = (open_price - prev_close)/prev_close
 
-    # change the pct_change to reflect price change from that day's open to that day's close:
-    for i in range(len(df)):
-        if (df['short_tracker'][i-1] == 0) and (df['short_tracker'][i] == -1):
-            df.iloc[i,-1] = (df['Close'][i] - df['Open'][i])/df['Open'][i]
+    # entry day: price change from that day's open to that day's close
+    entry_day = (prev_tracker == 0) & in_position
+    pct = np.where(entry_day, intraday_change, pct)
 
-    # change the pct_change to reflect price change from yesterday's close to today's open (and including the fees):
-    for i in range(1,len(df)):
-        if (df['short_tracker'][i] == 0) and (df['short_tracker'][i-1] == -1):
-            df.iloc[i-1,-1] = ((df['Open'][i-1] - df['Close'][i-2])/df['Close'][i-2]) - spread
+    # last day before the exit: price change from yesterday's close to today's open (including the spread)
+    exit_day = in_position & (next_tracker == 0)
+    pct = np.where(exit_day, overnight_change - spread, pct)
 
     # incorporate fees (financing costs)
-    df['pct_change_short'] = np.where(df['short_tracker'] == -1, df['pct_change_short'] - (fees/365),0)
-    
-    # calculate equity curve for short trades
-    df['Equity - Short'] = (1 + df['pct_change_short']).cumprod()
+    return np.where(in_position, pct - (fees/365) * (252/bars_per_year), 0)
 
-    df['Equity - Long & Short'] = 0.5 * (df['Equity - Long'] + df['Equity - Short'])
+# compact=True returns the equity curves as float32 (the returns & KPIs are still computed in float64)
+# with trades=True the trade ledger of both legs (see trade_ledger) is also returned
+# bars_per_year annualises the KPIs & scales the financing costs: 252 for daily bars, None to infer it from the
+# dates (see infer_bars_per_year), e.g. for hourly or minute bars
+def long_short_screen(data, long_entry_signal, long_exit_signal, short_entry_signal, short_exit_signal, spread, fees, compact=False,
+                      trades=False, bars_per_year=252):
+    if bars_per_year is None:
+        bars_per_year = infer_bars_per_year(data.index)
+    pct_change = data['Percent Change'].to_numpy(dtype=float)
+    open_price = data['Open'].to_numpy(dtype=float)
+    close_price = data['Close'].to_numpy(dtype=float)
 
-    maxDrawdown, maxDrawdownDuration, maxDrawdownDay=calculateMaxDD(df['Equity - Long & Short'])
+    # ---------- LONG TRADES ----------
+    long_tracker = position_tracker(long_entry_signal, long_exit_signal, 1)
+    pct_change_long = leg_returns(long_tracker, 1, pct_change, open_price, close_price, spread, fees, bars_per_year)
+
+    #---------- SHORT TRADES ----------
+    short_tracker = position_tracker(short_entry_signal, short_exit_signal, -1)
+    pct_change_short = leg_returns(short_tracker, -1, pct_change, open_price, close_price, spread, fees, bars_per_year)
+
+    equity_long, equity_short, equity_net, maxDrawdown, maxDrawdownDuration, maxDrawdownDay, sharpeRatio, cagr = screen_kpis(
+        pct_change_long, pct_change_short, bars_per_year)
+    equity = pd.DataFrame({'Equity - Long': equity_long, 'Equity - Short': equity_short,
+                           'Equity - Long & Short': equity_net}, index=data.index)
+    if compact:
+        equity = equity.astype(np.float32)
+
+    kpis = (maxDrawdown, maxDrawdownDuration, str(data.index[maxDrawdownDay])[:10], sharpeRatio, cagr)
+    if not trades:
+        return (equity,) + kpis
+    ledger = pd.concat([trade_ledger(long_tracker, 1, pct_change_long, open_price, close_price, data.index),
+                        trade_ledger(short_tracker, -1, pct_change_short, open_price, close_price, data.index)])
+    return (equity,) + kpis + (ledger.sort_values('Entry Date', kind='stable').reset_index(drop=True),)
+
+# equity curves & KPIs from the daily returns of the long & short legs, 1-D (bars) or 2-D (bars x tickers / parameter sets)
+def screen_kpis(pct_change_long, pct_change_short, bars_per_year=252):
+    # calculate the equity curves for long, short & combined trades
+    equity_long = np.cumprod(1 + pct_change_long, axis=0)
+    equity_short = np.cumprod(1 + pct_change_short, axis=0)
+    equity_net = 0.5 * (equity_long + equity_short)
+
+    maxDrawdown, maxDrawdownDuration, maxDrawdownDay=calculateMaxDD(equity_net)
 
-    pct_change_net = 0.5 * (df['pct_change_long'] + df['pct_change_short'])
+    pct_change_net = 0.5 * (pct_change_long + pct_change_short)
     # excess daily returns = strategy returns - financing cost, assuming risk-free rate of 2.5% & 252 trading days per year
-    excessRet = pct_change_net - (0.025/252)
-    sharpeRatio = np.sqrt(252) * np.mean(excessRet)/np.std(excessRet)
+    # (bars_per_year bars per year for other bar frequencies)
+    excessRet = pct_change_net - (0.025/bars_per_year)
+    sharpeRatio = np.sqrt(bars_per_year) * np.mean(excessRet, axis=0)/np.std(excessRet, axis=0)
+
+    cagr = (equity_net[-1])**(1/(len(equity_net)/bars_per_year))-1
+
+    return equity_long, equity_short, equity_net, maxDrawdown, maxDrawdownDuration, maxDrawdownDay, sharpeRatio, cagr
+
+# one row per trade of a leg, from the transitions of its position tracker (1-D, or 2-D with one column per
+# ticker / parameter set) and its daily returns from leg_returns:
+# Side, Entry Date & Entry Price (the open of the first bar in position), Exit Date & Exit Price (the open of the
+# last bar in position, where leg_returns exits), Holding Period (bars in position), Return (compounded daily
+# returns of the trade, net of spread & fees) and Open (still in position on the last bar: exit at the last close).
+# columns names the columns of a 2-D tracker (a Column column is added), index gives the dates.
+def trade_ledger(tracker, position, leg_pct_change, open_price, close_price, index=None, columns=None):
+    tracker = np.asarray(tracker)
+    one_dim = tracker.ndim == 1
+    in_position = (tracker == position).reshape(len(tracker), -1)
+    n, k = in_position.shape
+    pct = np.asarray(leg_pct_change, dtype=float).reshape(n, -1)
+    open_price = np.broadcast_to(np.asarray(open_price, dtype=float).reshape(n, -1), (n, k))
+    close_price = np.broadcast_to(np.asarray(close_price, dtype=float).reshape(n, -1), (n, k))
+
+    # runs of bars in position, column by column (as in drawdown_episodes)
+    padded = np.zeros((k, n + 2), dtype=np.int8)
+    padded[:, 1:-1] = in_position.T
+    change = np.diff(padded, axis=1)
+    col, entry = np.nonzero(change == 1)
+    last = np.nonzero(change == -1)[1] - 1
+    still_open = last == n - 1
+
+    # compounded return of each trade: products of the segments [entry, last] of each column's daily returns
+    growth = (1 + pct).T.ravel()
+    bounds = np.column_stack([col * n + entry, col * n + last + 1]).ravel()
+    if len(bounds) and bounds[-1] == n * k:
+        trade_growth = np.multiply.reduceat(np.append(growth, 1.0), bounds)[::2]
+    else:
+        trade_growth = np.multiply.reduceat(growth, bounds)[::2] if len(bounds) else np.zeros(0)
+
+    index = pd.RangeIndex(n) if index is None else index
+    exit_price = np.where(still_open, close_price[last, col], open_price[last, col])
+    ledger = pd.DataFrame({'Side': np.where(position > 0, 'Long', 'Short'), 'Entry Date': index[entry],
+                           'Entry Price': open_price[entry, col], 'Exit Date': index[last], 'Exit Price': exit_price,
+                           'Holding Period': last - entry + 1, 'Return': trade_growth - 1, 'Open': still_open})
+    if not one_dim:
+        ledger.insert(0, 'Column', col if columns is None else np.asarray(columns)[col])
+    return ledger
 
-    cagr = (df['Equity - Long & Short'][-1])**(1/(len(df)/252))-1
-    
-    return df[['Equity - Long','Equity - Short','Equity - Long & Short']],maxDrawdown, maxDrawdownDuration, str(list(df.index)[maxDrawdownDay])[:10], sharpeRatio, cagr
\ No newline at end of file
+# trade statistics of a ledger (from trade_ledger, long_short_screen or run_universe), overall or per group
+# (e.g. by='Ticker' or by=['Ticker','Side']): number of trades, win rate, average win & loss, reward-to-risk,
+# expectancy (average return per trade) & average holding period. A trade with a return of 0 is neither a win
+# nor a loss.
+def trade_stats(ledger, by=None):
+    returns = ledger['Return']
+    wins, losses = returns > 0, returns < 0
+    table = pd.DataFrame({'Return': returns, 'Win': wins, 'Loss': losses,
+                          'Win Return': returns.where(wins), 'Loss Return': returns.where(losses),
+                          'Holding Period': ledger['Holding Period']})
+    if by is None:
+        grouped = table.groupby(np.zeros(len(ledger), dtype=int))
+    else:
+        grouped = table.groupby([ledger[c] for c in ([by] if isinstance(by, str) else by)])
+    stats = pd.DataFrame({'Trades': grouped['Return'].count(), 'Win Rate': grouped['Win'].mean(),
+                          'Average Win': grouped['Win Return'].mean(), 'Average Loss': grouped['Loss Return'].mean(),
+                          'Expectancy': grouped['Return'].mean(),
+                          'Average Holding Period': grouped['Holding Period'].mean()})
+    stats.insert(4, 'Reward-to-Risk', (stats['Average Win'] / stats['Average Loss']).abs())
+    if by is None:
+        return stats.iloc[0].rename(None) if len(stats) else pd.Series(np.nan, index=stats.columns)
+    return stats
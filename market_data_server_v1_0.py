@@ -0,0 +1,159 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from benchmark_v1_0 import synthetic_ohlcv
+from market_data_v1_0 import download_frames
+
+# Local stand-in for the market-data HTTP source of market_data_v1_0, serving the CSV fixtures of
+# market_data_fixtures/ (one <ticker>.csv per ticker, Yahoo Finance columns) at http://127.0.0.1:<port>/<ticker>.csv,
+# with the failures the downloader has to cope with:
+#     FLAKY      HTTP 503 on the first FLAKY_FAILURES requests, then its CSV (retried with backoff)
+#     SLOW       its CSV after SLOW_SECONDS, longer than the scenarios' timeout (timed out on every attempt)
+#     EMPTY, CORRUPT, NEGATIVE, HIGHLOW      fixtures with no bars, an HTML page, a negative price, High below Low
+#     MISSING    no fixture: HTTP 404 (not retried)
+#
+#     python market_data_server_v1_0.py              # runs the scenarios, exit code 1 if one doesn't behave
+#     python market_data_server_v1_0.py --serve 8000 # serves the fixtures until interrupted
+#     python market_data_server_v1_0.py --make-fixtures   # writes the fixtures again
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'market_data_fixtures')
+FLAKY_FAILURES = 2
+SLOW_SECONDS = 2.0
+GOOD = ('GOOD1', 'GOOD2', 'GOOD3')
+
+# ticker -> expected outcome of the scenarios: None (downloaded) or the start of the failure reason
+SCENARIOS = {'GOOD1': None, 'GOOD2': None, 'GOOD3': None, 'FLAKY': None,
+             'SLOW': 'TimeoutError', 'EMPTY': 'corrupt data: no data', 'CORRUPT': 'corrupt data',
+             'NEGATIVE': 'corrupt data: non-positive', 'HIGHLOW': 'corrupt data: High below Low',
+             'MISSING': 'HTTP 404'}
+
+def _write(df, path):
+    df = df.copy()
+    df['Adj Close'] = df['Close']
+    df.index.name = 'Date'
+    df[['Open','High','Low','Close','Adj Close','Volume']].to_csv(path)
+
+# the CSV fixtures, generated from synthetic_ohlcv so they can be written again
+def make_fixtures(directory=FIXTURES, n_bars=300):
+    os.makedirs(directory, exist_ok=True)
+    for seed, ticker in enumerate(GOOD + ('FLAKY', 'SLOW')):
+        _write(synthetic_ohlcv(n_bars, seed=seed), os.path.join(directory, f'{ticker}.csv'))
+    with open(os.path.join(directory, 'EMPTY.csv'), 'w') as f:
+        f.write('Date,Open,High,Low,Close,Adj Close,Volume\n')
+    with open(os.path.join(directory, 'CORRUPT.csv'), 'w') as f:
+        f.write('<html><body>Too many requests</body></html>\n')
+    negative = synthetic_ohlcv(n_bars, seed=10)
+    negative.iloc[50, negative.columns.get_loc('Low')] = -1.0
+    _write(negative, os.path.join(directory, 'NEGATIVE.csv'))
+    high_low = synthetic_ohlcv(n_bars, seed=11)
+    high_low.iloc[80, high_low.columns.get_loc('High')] = high_low['Low'].iloc[80] - 1
+    _write(high_low, os.path.join(directory, 'HIGHLOW.csv'))
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, as the downloader's connection pool expects
+    directory = FIXTURES
+    hits = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type='text/csv'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        ticker = self.path.split('?')[0].strip('/')
+        ticker = ticker[:-4] if ticker.endswith('.csv') else ticker
+        with self.lock:
+            self.hits[ticker] = self.hits.get(ticker, 0) + 1
+            hits = self.hits[ticker]
+        if ticker == 'FLAKY' and hits <= FLAKY_FAILURES:
+            return self._send(503, b'Service Unavailable', 'text/plain')
+        if ticker == 'SLOW':
+            time.sleep(SLOW_SECONDS)
+        path = os.path.join(self.directory, f'{os.path.basename(ticker)}.csv')
+        if not os.path.exists(path):
+            return self._send(404, b'Not Found', 'text/plain')
+        with open(path, 'rb') as f:
+            self._send(200, f.read())
+
+# start the stand-in server in a background thread: returns (server, URL template for market_data_v1_0)
+def serve(directory=FIXTURES, port=0):
+    handler = type('Handler', (StandInHandler,), {'directory': directory, 'hits': {}, 'lock': threading.Lock()})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/{{ticker}}.csv?start={{start}}&end={{end}}'
+
+# download every scenario ticker from a fresh server: one row per ticker with the outcome, the number of
+# requests the server received and whether it is the expected one
+def run_scenarios(directory=FIXTURES, max_workers=4, timeout=0.5, retries=2, backoff=0.05):
+    server, url = serve(directory)
+    try:
+        frames, failures = download_frames(list(SCENARIOS), url, '2000-01-01', '2002-01-01', max_workers=max_workers,
+                                           timeout=timeout, retries=retries, backoff=backoff)
+        hits = dict(server.RequestHandlerClass.hits)
+    finally:
+        server.shutdown()
+        server.server_close()
+    rows = []
+    for ticker, expected in SCENARIOS.items():
+        error = failures.get(ticker)
+        ok = error is None if expected is None else (error is not None and error.startswith(expected))
+        if ok and ticker in frames:
+            # the downloaded bars are the fixture's, exactly
+            fixture = pd.read_csv(os.path.join(directory, f'{ticker}.csv'), index_col=0, parse_dates=True,
+                                  float_precision='round_trip')
+            ok = np.array_equal(frames[ticker][['Open','High','Low','Close']].to_numpy(),
+                                fixture[['Open','High','Low','Close']].to_numpy())
+        rows.append({'Ticker': ticker, 'Bars': len(frames[ticker]) if ticker in frames else 0,
+                     'Failure': error, 'Requests': hits.get(ticker, 0), 'OK': ok})
+    return pd.DataFrame(rows).set_index('Ticker')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stand-in HTTP server for market_data_v1_0 and its scenarios.')
+    parser.add_argument('--directory', default=FIXTURES)
+    parser.add_argument('--serve', type=int, metavar='PORT', help='serve the fixtures on this port until interrupted')
+    parser.add_argument('--make-fixtures', action='store_true', help='write the CSV fixtures again')
+    args = parser.parse_args(argv)
+
+    if args.make_fixtures:
+        make_fixtures(args.directory)
+        print(f'fixtures written to {args.directory}')
+        return 0
+    if args.serve is not None:
+        server, url = serve(args.directory, args.serve)
+        print(f'serving {args.directory} at {url}')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return 0
+
+    results = run_scenarios(args.directory)
+    with pd.option_context('display.width', 200, 'display.max_colwidth', 60):
+        print(results)
+    failed = results.index[~results['OK']]
+    if len(failed):
+        print(f'{len(failed)} scenario(s) did not behave as expected: ' + ', '.join(failed))
+        return 1
+    print(f'all {len(results)} scenarios behaved as expected')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import http.client
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from long_short_screen_v1_3 import long_short_screen
+from multistock_runner_v1_0 import EMA_VORTEX_SSL, KPI_COLUMNS
+from pipeline_profiler_v1_0 import stage
+
+# Concurrent download of the price history of many tickers, replacing the blocking yf.download loop of the
+# multistock notebook:
+#
+#     for ticker, df, error in fetch_frames(tickers, 'http://host/{ticker}.csv?start={start}&end={end}', start, end):
+#         ...                                            # each ticker as soon as it has arrived
+#     frames, failures = download_frames(tickers, source, start, end)
+#     summary, equity, failures = screen_downloads(tickers, source, start, end)   # screened as they arrive
+#
+# The source is a URL template returning a CSV file (Date, Open, High, Low, Close, Adj Close, Volume as saved from
+# Yahoo Finance), fetched with a pool of keep-alive HTTP connections, or a function download(ticker, start, end)
+# returning a DataFrame (e.g. a wrapper of yf.download, whose timeouts are then its own).
+# At most max_workers tickers are downloaded at a time; failed requests (connection errors, timeouts, HTTP 429 &
+# 5xx) are retried with exponential backoff, other HTTP errors are not. Every frame is validated (validate_frame)
+# and tickers with missing, empty or corrupted data are dropped, with the reason in the failures.
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# keep-alive HTTP(S) connections shared by the download threads, at most max_connections idle per host
+class HTTPPool:
+    def __init__(self, max_connections=8, timeout=10):
+        self.max_connections, self.timeout = max_connections, timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _connection(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def _release(self, key, connection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_connections:
+                idle.append(connection)
+                return
+        connection.close()
+
+    # (status, body) of a GET request. a reused connection that the server has closed in the meantime is
+    # replaced by a new one once.
+    def get(self, url):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        while True:
+            connection, reused = self._connection(key)
+            try:
+                connection.request('GET', path, headers={'Connection': 'keep-alive'})
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(key, connection)
+            return response.status, body
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for connection in idle:
+                    connection.close()
+            self._idle.clear()
+
+# the frame of one ticker checked & cleaned: Date index (sorted, no duplicates, no time zone), rows without any
+# price dropped (as dropna(how='all') in the notebook). raises ValueError when the frame is unusable: no OHLC
+# columns, unreadable dates or prices, fewer than min_bars bars, non-positive prices or High below Low.
+def validate_frame(df, min_bars=1):
+    if df is None or len(df) == 0:
+        raise ValueError('no data')
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.droplevel(-1, axis=1)
+    missing = [c for c in ('Open','High','Low','Close') if c not in df.columns]
+    if missing:
+        raise ValueError(f'missing columns {missing}')
+    try:
+        index = pd.DatetimeIndex(pd.to_datetime(df.index))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'unreadable dates ({e})')
+    df.index = (index.tz_localize(None) if index.tz is not None else index).rename('Date')
+    for column in df.columns:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+
+    prices = ['Open','High','Low','Close']
+    df = df.dropna(how='all', subset=prices)
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    if len(df) < min_bars:
+        raise ValueError(f'{len(df)} bars (at least {min_bars} needed)')
+    values = df[prices].to_numpy(dtype=float)
+    if np.any(values[~np.isnan(values)] <= 0) or np.any(np.isinf(values)):
+        raise ValueError('non-positive or infinite prices')
+    with np.errstate(invalid='ignore'):
+        if np.any(df['High'].to_numpy() < df['Low'].to_numpy()):
+            raise ValueError('High below Low')
+    return df
+
+def _read_csv(body):
+    return pd.read_csv(io.BytesIO(body), index_col=0, float_precision='round_trip')
+
+def _url(source, ticker, start, end):
+    return source.format(ticker=quote(ticker, safe=''), start=pd.Timestamp(start).strftime('%Y-%m-%d'),
+                         end=pd.Timestamp(end).strftime('%Y-%m-%d'))
+
+# one ticker with retries: (frame, None) or (None, reason)
+def _fetch(ticker, source, start, end, pool, retries, backoff, min_bars):
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2**(attempt - 1))
+        try:
+            if callable(source):
+                df = source(ticker, start, end)
+            else:
+                status, body = pool.get(_url(source, ticker, start, end))
+                if status != 200:
+                    error = f'HTTP {status}'
+                    if status in RETRY_STATUS:
+                        continue
+                    return None, error
+                df = body
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            continue
+        # a complete response that can't be read is corrupted data, not retried
+        try:
+            return validate_frame(_read_csv(df) if isinstance(df, bytes) else df, min_bars), None
+        except ValueError as e:
+            return None, f'corrupt data: {e}'
+        except Exception as e:
+            return None, f'corrupt data: {type(e).__name__}: {e}'
+    return None, error
+
+# download the tickers concurrently, yielding (ticker, frame, None) or (ticker, None, reason) in the order they
+# complete. max_workers: downloads at a time, timeout: seconds per connection / read, retries: extra attempts
+# after a failed one, waiting backoff, 2 * backoff, 4 * backoff ... seconds.
+# profiler: optional PipelineProfiler; the 'download' stage records the time spent waiting for each next ticker
+# (the download threads themselves are not profiled, the profiler measures the whole process).
+def fetch_frames(tickers, source, start, end, max_workers=8, timeout=10, retries=3, backoff=0.5, min_bars=1,
+                 profiler=None):
+    pool = None if callable(source) else HTTPPool(max_workers, timeout)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_fetch, ticker, source, start, end, pool, retries, backoff, min_bars): ticker
+                       for ticker in tickers}
+            try:
+                completed = as_completed(futures)
+                for _ in range(len(futures)):
+                    with stage(profiler, 'download'):
+                        future = next(completed)
+                    df, error = future.result()
+                    yield futures[future], df, error
+            finally:
+                for future in futures:
+                    future.cancel()
+    finally:
+        if pool is not None:
+            pool.close()
+
+# all the tickers downloaded: (dictionary of ticker -> frame in the order of tickers, dictionary of ticker -> reason
+# for the tickers that were dropped), e.g. to replace the download loop of the notebook
+def download_frames(tickers, source, start, end, **options):
+    results = {ticker: (df, error) for ticker, df, error in fetch_frames(tickers, source, start, end, **options)}
+    frames = {ticker: results[ticker][0] for ticker in tickers if results[ticker][0] is not None}
+    failures = {ticker: results[ticker][1] for ticker in tickers if results[ticker][0] is None}
+    return frames, failures
+
+# screen one ticker's frame with a strategy as run_universe does (pair (indicators, signals) or single function)
+def screen_frame(data, strategy=EMA_VORTEX_SSL, spread=0.005, fees=0.05):
+    df = data.copy()
+    df['Percent Change'] = df['Close'].pct_change()
+    if isinstance(strategy, tuple):
+        indicators, signals = strategy
+        indicators(df)
+        signals = signals(df)
+    else:
+        signals = strategy(df)
+    return long_short_screen(df, *signals, spread, fees)
+
+# download & screen: each ticker is screened in this thread as soon as it has arrived, while the others are still
+# downloading. returns the KPI summary & equity curves as run_universe (in the order of tickers, without the
+# dropped tickers) and the failures.
+def screen_downloads(tickers, source, start, end, strategy=EMA_VORTEX_SSL, spread=0.005, fees=0.05, profiler=None,
+                     **options):
+    kpis, equity, failures = {}, {}, {}
+    for ticker, df, error in fetch_frames(tickers, source, start, end, profiler=profiler, **options):
+        if df is None:
+            failures[ticker] = error
+            continue
+        with stage(profiler, 'screen', ticker):
+            result = screen_frame(df, strategy, spread, fees)
+        equity[ticker], kpis[ticker] = result[0], result[1:6]
+    done = [ticker for ticker in tickers if ticker in kpis]
+    summary = pd.DataFrame([kpis[ticker] for ticker in done], columns=KPI_COLUMNS,
+                           index=pd.Index(done, name='Ticker'))
+    return summary, {ticker: equity[ticker] for ticker in done}, {t: failures[t] for t in tickers if t in failures}
@@ -0,0 +1,185 @@
+import os
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool, shared_memory
+
+from TA_indicators_v2_1 import *
+from long_short_screen_v1_3 import long_short_screen
+from pipeline_profiler_v1_0 import PipelineProfiler, stage
+from results_store_v1_0 import KPI_COLUMNS, start_run, done_tickers, save_results, load_run, load_trades
+from signal_rules_v1_0 import EMA_VORTEX_SSL_RULES
+
+# Multistock runner: screens a universe of tickers with long_short_screen on a pool of worker processes.
+# The OHLC prices of the whole universe are placed in one shared memory block (fields x bars x tickers) so the
+# workers read them directly instead of receiving pickled DataFrames; tickers are sent to the workers in chunks
+# and the KPIs & equity curves are collected back in ticker order. workers=1 runs everything in this process
+# with the same code path, giving identical results.
+# compact=True keeps the shared prices and the returned equity curves as float32, halving their memory (the
+# indicators & KPIs are computed in float64 from the float32 prices, see the README for the tolerance).
+# With a PipelineProfiler (pipeline_profiler_v1_0), the time spent in each stage (stack, load, indicators, signals,
+# screen) is recorded per ticker, in the workers too. The equity curve charts are rendered afterwards with
+# chart_renderer_v1_0.render_equity_charts.
+# With a results store (results_store_v1_0), the results of each chunk of tickers are saved as soon as it is done,
+# and a run interrupted half-way is resumed with the same run ID, skipping the tickers already saved.
+
+FIELDS = ('Open','High','Low','Close','Volume')
+
+# the strategy of multistock_backtester.ipynb, in two steps: the indicators are added to df, then the four
+# entry/exit signals are evaluated on them.
+# custom strategies must be module-level functions so they can be sent to the workers: either a pair
+# (indicators, signals) like these two, or a single function that does both (profiled as one 'strategy' stage).
+def ema_vortex_ssl_indicators(df):
+    df[['True Range','ATR']] = ATR(df)
+    df['EMA'] = EMA(df,20)
+    df[['SSL Down','SSL Up']] = SSL(df,20)
+    df[['VI+','VI-']] = vortex(df,10)
+
+# (long entry, long exit, short entry, short exit) from the compiled rules in signal_rules_v1_0
+def ema_vortex_ssl_signals(df):
+    return EMA_VORTEX_SSL_RULES.signals(df)
+
+def ema_vortex_ssl_strategy(df):
+    ema_vortex_ssl_indicators(df)
+    return ema_vortex_ssl_signals(df)
+
+EMA_VORTEX_SSL = (ema_vortex_ssl_indicators, ema_vortex_ssl_signals)
+
+# state of the current process (a worker, or this process for the serial run)
+_worker = {}
+
+def _init_worker(shm_name, shape, dtype, index, tickers, strategy, spread, fees, compact, trades, profiler_options):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    profiler = None if profiler_options is None else PipelineProfiler(**profiler_options)
+    _worker.update(shm=shm, prices=np.ndarray(shape, dtype=dtype, buffer=shm.buf), index=index, tickers=tickers,
+                   strategy=strategy, spread=spread, fees=fees, compact=compact, trades=trades, profiler=profiler)
+
+def _screen_ticker(column):
+    prices, index, profiler = _worker['prices'], _worker['index'], _worker['profiler']
+    ticker = _worker['tickers'][column]
+    with stage(profiler, 'load', ticker):
+        valid = ~np.isnan(prices[FIELDS.index('Close'), :, column])
+        df = pd.DataFrame({field: prices[f, valid, column].astype(np.float64) for f, field in enumerate(FIELDS)}, index=index[valid])
+        df['Percent Change'] = df['Close'].pct_change()
+
+    strategy = _worker['strategy']
+    if isinstance(strategy, tuple):
+        indicators, signals = strategy
+        with stage(profiler, 'indicators', ticker):
+            indicators(df)
+        with stage(profiler, 'signals', ticker):
+            signals = signals(df)
+    else:
+        with stage(profiler, 'strategy', ticker):
+            signals = strategy(df)
+    with stage(profiler, 'screen', ticker):
+        result = long_short_screen(df, *signals, _worker['spread'], _worker['fees'], compact=_worker['compact'],
+                                   trades=_worker['trades'])
+    equity, kpis = result[0], result[1:6]
+    return (kpis, equity) + result[6:]
+
+# results of a chunk of tickers, with the profiler records of the chunk (None without profiler)
+def _screen_chunk(columns):
+    results = [_screen_ticker(column) for column in columns]
+    profiler = _worker['profiler']
+    return results, None if profiler is None else profiler.export()
+
+# stack the per-ticker frames into one (fields x bars x tickers) array on the union of their dates
+def stack_prices(frames, fields=FIELDS, dtype=np.float64):
+    tickers = list(frames.keys())
+    index = frames[tickers[0]].index
+    for ticker in tickers[1:]:
+        index = index.union(frames[ticker].index)
+    prices = np.full((len(fields), len(index), len(tickers)), np.nan, dtype=dtype)
+    for j, ticker in enumerate(tickers):
+        rows = index.get_indexer(frames[ticker].index)
+        prices[:, rows, j] = frames[ticker][list(fields)].to_numpy(dtype=dtype).T
+    return prices, index, tickers
+
+# parameters of a run recorded in the results store (strategy functions by name)
+def run_parameters(strategy, spread, fees, compact, trades):
+    functions = strategy if isinstance(strategy, tuple) else (strategy,)
+    return {'strategy': [f'{f.__module__}.{f.__name__}' for f in functions], 'spread': spread, 'fees': fees,
+            'compact': compact, 'trades': trades}
+
+# screen every ticker in frames (dictionary of ticker -> OHLCV DataFrame), returns the KPI summary (one row per
+# ticker, in the order of frames) and a dictionary of ticker -> equity curves.
+# workers: number of processes (None = all cores, 1 = serial in this process), chunksize: tickers per task.
+# profiler: optional PipelineProfiler, which receives the stage records of all the workers.
+# with trades=True the trade ledger of all the tickers (with a Ticker column) is also returned, see trade_stats.
+# store: optional directory of a results store where the results are saved under run_id (required with a store,
+# it is how the run is resumed and read back) as the chunks finish; tickers already saved under run_id are not
+# screened again, and the results of the whole run are returned from the store (equity curves memory-mapped).
+def run_universe(frames, strategy=EMA_VORTEX_SSL, spread=0.005, fees=0.05, workers=None, chunksize=None,
+                 compact=False, profiler=None, trades=False, store=None, run_id=None):
+    all_tickers = list(frames.keys())
+    if store is not None:
+        if run_id is None:
+            raise ValueError('run_id is required with a results store, to resume the run or load it back')
+        run_id = start_run(store, run_id, run_parameters(strategy, spread, fees, compact, trades))
+        done = done_tickers(store, run_id)
+        frames = {ticker: df for ticker, df in frames.items() if ticker not in done}
+        if not frames:
+            return _load_run(store, run_id, all_tickers, trades)
+
+    with stage(profiler, 'stack'):
+        prices, index, tickers = stack_prices(frames, dtype=np.float32 if compact else np.float64)
+    workers = os.cpu_count() if workers is None else max(1, workers)
+    workers = min(workers, len(tickers))
+    if chunksize is None:
+        # a few chunks per worker keeps them all busy when some tickers take longer than others
+        chunksize = max(1, int(np.ceil(len(tickers) / (4 * workers))))
+    chunks = [list(range(i, min(i + chunksize, len(tickers)))) for i in range(0, len(tickers), chunksize)]
+
+    # results of the chunks in order, saved to the store as they arrive
+    def collect(chunk_results):
+        results = []
+        for chunk, (chunk_result, profile) in zip(chunks, chunk_results):
+            if store is not None:
+                with stage(profiler, 'save'):
+                    save_results(store, run_id, [(tickers[column], result[0], result[1]) + tuple(result[2:])
+                                                 for column, result in zip(chunk, chunk_result)])
+            results.append((chunk_result, profile))
+        return results
+
+    shm = shared_memory.SharedMemory(create=True, size=prices.nbytes)
+    try:
+        np.ndarray(prices.shape, dtype=prices.dtype, buffer=shm.buf)[:] = prices
+        init_args = (shm.name, prices.shape, prices.dtype, index, tickers, strategy, spread, fees, compact, trades,
+                     None if profiler is None else profiler.options)
+        del prices
+        if workers == 1:
+            _init_worker(*init_args)
+            try:
+                results = collect(_screen_chunk(chunk) for chunk in chunks)
+            finally:
+                _worker.pop('prices', None)
+                _worker.pop('shm').close()
+        else:
+            with Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+                results = collect(pool.imap(_screen_chunk, chunks, chunksize=1))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if profiler is not None:
+        for _, profile in results:
+            profiler.merge(profile)
+    if store is not None:
+        return _load_run(store, run_id, all_tickers, trades)
+    results = [result for chunk, _ in results for result in chunk]
+    summary = pd.DataFrame([result[0] for result in results], columns=KPI_COLUMNS, index=pd.Index(tickers, name='Ticker'))
+    equity = {ticker: result[1] for ticker, result in zip(tickers, results)}
+    if not trades:
+        return summary, equity
+    ledger = pd.concat([result[2] for result in results], keys=tickers, names=['Ticker', None])
+    return summary, equity, ledger.reset_index(level=0).reset_index(drop=True)
+
+# results of a whole run from the store, in the order of tickers
+def _load_run(store, run_id, tickers, trades):
+    summary, equity = load_run(store, run_id, tickers)
+    if not trades:
+        return summary, equity
+    ledger = load_trades(store, run_id, tickers)
+    order = pd.Series(range(len(tickers)), index=tickers)
+    ledger = ledger.iloc[np.argsort(order[ledger['Ticker']].to_numpy(), kind='stable')].reset_index(drop=True)
+    return summary, equity, ledger
@@ -0,0 +1,151 @@
+import os
+import numpy as np
+import pandas as pd
+
+from pipeline_profiler_v1_0 import stage
+
+# Local on-disk OHLCV store, so the backtesters don't need to re-download the full history on every run.
+#
+# Columnar layout, one directory per ticker and one raw binary file per field:
+#     <root>/<ticker>/Date.i8                      dates as int64 nanoseconds
+#     <root>/<ticker>/Open.f8, High.f8, ...        prices & volume as float64
+# Files are read with memory mapping and new bars are appended to the end of each file. The Date file is written
+# last, so its length is the number of complete bars; anything beyond it in the other files (an interrupted append)
+# is discarded on the next append.
+
+FIELDS = ('Open','High','Low','Close','Adj Close','Volume')
+
+def _path(root, ticker, field):
+    return os.path.join(root, ticker, f'{field}.i8' if field == 'Date' else f'{field}.f8')
+
+# tickers available in the store
+def list_tickers(root):
+    if not os.path.isdir(root):
+        return []
+    return sorted(t for t in os.listdir(root) if os.path.exists(_path(root, t, 'Date')))
+
+# number of complete bars stored for a ticker
+def stored_bars(root, ticker):
+    path = _path(root, ticker, 'Date')
+    return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+# date of the last stored bar (None if the ticker isn't in the store yet)
+def last_date(root, ticker):
+    n = stored_bars(root, ticker)
+    if n == 0:
+        return None
+    return pd.Timestamp(np.memmap(_path(root, ticker, 'Date'), dtype=np.int64, mode='r', offset=(n - 1) * 8, shape=(1,))[0])
+
+# bring a downloaded / CSV frame to the store's fields (yfinance may return (field, ticker) column pairs)
+def _normalise(df):
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.droplevel(-1, axis=1)
+    df = df.reindex(columns=list(FIELDS))
+    df.index = pd.DatetimeIndex(df.index).tz_localize(None) if getattr(df.index, 'tz', None) else pd.DatetimeIndex(df.index)
+    return df[~df.index.duplicated(keep='last')].sort_index()
+
+# append the bars of df that are newer than the last stored date, returns the number of bars appended
+def append_bars(root, ticker, df):
+    df = _normalise(df).dropna(how='all')
+    last = last_date(root, ticker)
+    if last is not None:
+        df = df[df.index > last]
+    if len(df) == 0:
+        return 0
+
+    os.makedirs(os.path.join(root, ticker), exist_ok=True)
+    n = stored_bars(root, ticker)
+    for field in FIELDS:
+        path = _path(root, ticker, field)
+        with open(path, 'ab') as f:
+            # drop what an interrupted append may have left behind
+            f.truncate(n * 8)
+            f.write(df[field].to_numpy(dtype=np.float64).tobytes())
+    with open(_path(root, ticker, 'Date'), 'ab') as f:
+        f.write(df.index.values.astype('datetime64[ns]').view(np.int64).tobytes())
+    return len(df)
+
+# replace whatever is stored for a ticker with df
+def write_bars(root, ticker, df):
+    for field in FIELDS + ('Date',):
+        path = _path(root, ticker, field)
+        if os.path.exists(path):
+            os.remove(path)
+    return append_bars(root, ticker, df)
+
+# memory-mapped columns of one ticker: dictionary of field -> read-only array (Date as datetime64[ns])
+def load_columns(root, ticker, fields=FIELDS):
+    n = stored_bars(root, ticker)
+    if n == 0:
+        raise KeyError(f'{ticker} is not in the store at {root}')
+    columns = {'Date': np.memmap(_path(root, ticker, 'Date'), dtype=np.int64, mode='r', shape=(n,)).view('datetime64[ns]')}
+    for field in fields:
+        columns[field] = np.memmap(_path(root, ticker, field), dtype=np.float64, mode='r', shape=(n,))
+    return columns
+
+# one ticker as an OHLCV DataFrame indexed by date, optionally restricted to [start, end]
+def load_bars(root, ticker, fields=FIELDS, start=None, end=None):
+    columns = load_columns(root, ticker, fields)
+    dates = columns['Date']
+    lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+    hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end), 'ns'), side='right')
+    return pd.DataFrame({field: np.array(columns[field][lo:hi]) for field in fields},
+                        index=pd.DatetimeIndex(dates[lo:hi], name='Date'))
+
+# a dictionary of ticker -> DataFrame, like the df dictionary of the multistock notebook
+def load_frames(root, tickers=None, fields=FIELDS, start=None, end=None):
+    tickers = list_tickers(root) if tickers is None else tickers
+    return {ticker: load_bars(root, ticker, fields, start, end) for ticker in tickers}
+
+# the whole universe as aligned wide DataFrames (dates x tickers), one per field, on the union of the dates.
+# the columns are copied straight from the memory-mapped files into the panel.
+def load_panel(root, tickers=None, fields=('Open','High','Low','Close','Volume'), start=None, end=None):
+    tickers = list_tickers(root) if tickers is None else list(tickers)
+    columns = {ticker: load_columns(root, ticker, fields) for ticker in tickers}
+    dates = np.unique(np.concatenate([c['Date'] for c in columns.values()]))
+    if start is not None:
+        dates = dates[dates >= np.datetime64(pd.Timestamp(start), 'ns')]
+    if end is not None:
+        dates = dates[dates <= np.datetime64(pd.Timestamp(end), 'ns')]
+
+    panel = {field: np.full((len(dates), len(tickers)), np.nan) for field in fields}
+    for j, ticker in enumerate(tickers):
+        rows = np.searchsorted(dates, columns[ticker]['Date'])
+        inside = (rows < len(dates))
+        inside[inside] = dates[rows[inside]] == columns[ticker]['Date'][inside]
+        for field in fields:
+            panel[field][rows[inside], j] = columns[ticker][field][inside]
+    index = pd.DatetimeIndex(dates, name='Date')
+    return {field: pd.DataFrame(panel[field], index=index, columns=tickers) for field in fields}
+
+# load a CSV dump (Date, Open, High, Low, Close, Adj Close, Volume as saved from Yahoo Finance) into the store,
+# the ticker defaults to the file name (e.g. GSK.L.csv -> GSK.L)
+def ingest_csv(root, path, ticker=None):
+    ticker = os.path.splitext(os.path.basename(path))[0] if ticker is None else ticker
+    df = pd.read_csv(path, index_col=0, parse_dates=True)
+    return ticker, append_bars(root, ticker, df)
+
+# ingest every CSV file in a directory, returns a dictionary of ticker -> number of bars appended
+def ingest_csv_dir(root, directory):
+    return dict(ingest_csv(root, os.path.join(directory, name))
+                for name in sorted(os.listdir(directory)) if name.lower().endswith('.csv'))
+
+# download only the bars after the last stored date for each ticker (the full history from start for new tickers).
+# download(ticker, start, end) defaults to yf.download; returns a dictionary of ticker -> number of bars appended.
+# with a PipelineProfiler, the 'download' & 'store' stages of each ticker are recorded.
+def update_from_download(root, tickers, start, end, download=None, profiler=None):
+    if download is None:
+        import yfinance as yf
+        download = lambda ticker, start, end: yf.download(ticker, start, end, progress=False)
+    appended = {}
+    for ticker in tickers:
+        last = last_date(root, ticker)
+        since = start if last is None else last + pd.Timedelta(days=1)
+        if pd.Timestamp(since) > pd.Timestamp(end):
+            appended[ticker] = 0
+            continue
+        with stage(profiler, 'download', ticker):
+            bars = download(ticker, since, end)
+        with stage(profiler, 'store', ticker):
+            appended[ticker] = append_bars(root, ticker, bars)
+    return appended
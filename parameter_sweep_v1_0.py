@@ -0,0 +1,97 @@
+import itertools
+import numpy as np
+import pandas as pd
+
+from long_short_screen_v1_3 import position_tracker, leg_returns, screen_kpis
+
+# Parameter sweep for the EMA / vortex / SSL strategy of strategy_backtester.ipynb:
+#     long entry:  Close > EMA & VI+ > threshold & SSL Up > SSL Down,    long exit:  SSL Up < SSL Down
+#     short entry: Close < EMA & VI- > threshold & SSL Down > SSL Up,    short exit: SSL Down < SSL Up
+# (threshold None compares VI+ with VI- instead, as in multistock_backtester.ipynb)
+#
+# The rolling sums & means for every window length come from one set of prefix sums per input series, the
+# indicators are computed once per distinct parameter value, and the combinations are evaluated through the
+# long_short_screen engine in batches, one column per combination.
+# Rolling sums from prefix sums can differ from pandas' rolling sums in the last few bits, which only matters
+# for signals that are exact ties; otherwise the KPIs are those of long_short_screen for the same parameters.
+
+# rolling sums of x (1-D) for each window length, as a (bars x windows) array (NaN until the window is full,
+# and for windows containing a NaN, like rolling(window, min_periods=window).sum())
+def rolling_sums(x, windows):
+    x = np.asarray(x, dtype=float)
+    windows = np.asarray(windows, dtype=int)
+    missing = np.isnan(x)
+    sum_x = np.concatenate([[0.0], np.cumsum(np.where(missing, 0, x))])
+    n_missing = np.concatenate([[0], np.cumsum(missing)])
+
+    end = np.arange(1, len(x) + 1)[:, None]
+    start = end - windows[None, :]
+    valid = start >= 0
+    start = np.where(valid, start, 0)
+    sums = sum_x[end] - sum_x[start]
+    return np.where(valid & (n_missing[end] - n_missing[start] == 0), sums, np.nan)
+
+def rolling_means(x, windows):
+    return rolling_sums(x, windows) / np.asarray(windows, dtype=float)
+
+# EMA of the close for each period (bars x periods)
+def ema_grid(close, periods):
+    close = pd.Series(np.asarray(close, dtype=float))
+    return np.column_stack([close.ewm(span=p, adjust=False, min_periods=p).mean().to_numpy() for p in periods])
+
+# SSL Up - SSL Down for each period (bars x periods)
+def ssl_spread_grid(high, low, close, periods):
+    high_sma = rolling_means(high, periods)
+    low_sma = rolling_means(low, periods)
+    close = np.asarray(close, dtype=float)[:, None]
+    hi_lo = pd.DataFrame(np.where(close > high_sma, 1, np.where(close < low_sma, -1, np.nan))).ffill().to_numpy()
+    ssl_down = np.where(hi_lo < 0, high_sma, low_sma)
+    ssl_up = np.where(hi_lo < 0, low_sma, high_sma)
+    return ssl_up - ssl_down
+
+# VI+ & VI- for each period (bars x periods each)
+def vortex_grid(high, low, close, periods):
+    high, low, close = (np.asarray(x, dtype=float) for x in (high, low, close))
+    prev_high, prev_low, prev_close = (np.concatenate([[np.nan], x[:-1]]) for x in (high, low, close))
+    true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    sum_TR = rolling_sums(true_range, periods)
+    plus_VM = rolling_sums(np.abs(high - prev_low), periods)
+    minus_VM = rolling_sums(np.abs(low - prev_high), periods)
+    return plus_VM / sum_TR, minus_VM / sum_TR
+
+# evaluate every combination of the parameter values on one ticker's OHLC DataFrame.
+# returns a results table with one row per combination: the parameters, Max Drawdown, Max Drawdown Duration,
+# Sharpe Ratio & CAGR. batch_size combinations are evaluated at a time to keep the memory bounded.
+def sweep(data, ema_periods=(20,50), ssl_periods=(20,), vortex_periods=(10,), vi_thresholds=(None,),
+          spread=0.005, fees=0.05, batch_size=1024):
+    high, low, close, open_price = (data[c].to_numpy(dtype=float) for c in ('High','Low','Close','Open'))
+    pct_change = data['Close'].pct_change().to_numpy()
+
+    ema = ema_grid(close, ema_periods)
+    ssl_spread = ssl_spread_grid(high, low, close, ssl_periods)
+    vi_plus, vi_minus = vortex_grid(high, low, close, vortex_periods)
+    above_ema, below_ema = close[:, None] > ema, close[:, None] < ema
+    ssl_up, ssl_down = ssl_spread > 0, ssl_spread < 0
+
+    combos = list(itertools.product(range(len(ema_periods)), range(len(ssl_periods)),
+                                    range(len(vortex_periods)), range(len(vi_thresholds))))
+    results = []
+    for batch_start in range(0, len(combos), batch_size):
+        e, s, v, t = (np.array(c) for c in zip(*combos[batch_start:batch_start + batch_size]))
+        threshold = np.array([np.nan if vi_thresholds[i] is None else vi_thresholds[i] for i in t])
+        vi_plus_b, vi_minus_b = vi_plus[:, v], vi_minus[:, v]
+        long_vortex = np.where(np.isnan(threshold), vi_plus_b > vi_minus_b, vi_plus_b > threshold)
+        short_vortex = np.where(np.isnan(threshold), vi_minus_b > vi_plus_b, vi_minus_b > threshold)
+
+        long_tracker = position_tracker(above_ema[:, e] & long_vortex & ssl_up[:, s], ssl_down[:, s], 1)
+        short_tracker = position_tracker(below_ema[:, e] & short_vortex & ssl_down[:, s], ssl_up[:, s], -1)
+        pct_change_long = leg_returns(long_tracker, 1, pct_change, open_price, close, spread, fees)
+        pct_change_short = leg_returns(short_tracker, -1, pct_change, open_price, close, spread, fees)
+        _, _, _, maxDD, maxDDD, _, sharpe, cagr = screen_kpis(pct_change_long, pct_change_short)
+
+        results.append(pd.DataFrame({'EMA period': np.asarray(ema_periods)[e], 'SSL period': np.asarray(ssl_periods)[s],
+                                     'Vortex period': np.asarray(vortex_periods)[v],
+                                     'VI threshold': [vi_thresholds[i] for i in t],
+                                     'Max Drawdown': maxDD, 'Max Drawdown Duration': maxDDD,
+                                     'Sharpe Ratio': sharpe, 'CAGR': cagr}))
+    return pd.concat(results, ignore_index=True)
@@ -0,0 +1,171 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+# Per-stage instrumentation of the multistock pipeline (download, indicators, signals, screener, charts ...).
+#
+#     profiler = PipelineProfiler(trace_memory=True, cprofile=True)
+#     summary, equity = run_universe(frames, profiler=profiler)
+#     with profiler.stage('charts'):
+#         ...
+#     profiler.summary()                        # one row per stage
+#     profiler.save('run_profile.json')         # or .csv (one row per stage & ticker)
+#     profiler.save_profiles('profiles')        # cProfile stats per stage, for snakeviz / pstats
+#     compare_reports('before.json', 'after.json')
+#
+# Every stage records its wall time, CPU time (of this process) and the change in the number of allocated memory
+# blocks (sys.getallocatedblocks, always on). trace_memory=True adds the bytes allocated & the peak memory of the
+# stage from tracemalloc, cprofile=True profiles each stage with its own cProfile profiler; both slow the run
+# down, so they are off by default. Stages should not be nested when either is on.
+
+COLUMNS = ['stage','ticker','wall seconds','cpu seconds','allocated blocks','allocated MB','peak MB']
+
+class PipelineProfiler:
+    def __init__(self, trace_memory=False, cprofile=False):
+        self.trace_memory = trace_memory
+        self.cprofile = cprofile
+        self.records = []
+        # cProfile profiler of each stage in this process, and raw stats received from worker processes
+        self.profiles = {}
+        self.worker_stats = {}
+        self._profiling = False
+
+    # options to create the same profiler in a worker process
+    @property
+    def options(self):
+        return {'trace_memory': self.trace_memory, 'cprofile': self.cprofile}
+
+    @contextmanager
+    def stage(self, name, ticker=None):
+        profile = None
+        if self.cprofile and not self._profiling:
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        started_tracing = self.trace_memory and not tracing
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+        blocks_start = sys.getallocatedblocks()
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        if profile is not None:
+            self._profiling = True
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            record = {'stage': name, 'ticker': ticker, 'wall seconds': wall, 'cpu seconds': cpu,
+                      'allocated blocks': sys.getallocatedblocks() - blocks_start}
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record['allocated MB'] = (current - memory_start) / 2**20
+                record['peak MB'] = (peak - memory_start) / 2**20
+                if started_tracing:
+                    tracemalloc.stop()
+            self.records.append(record)
+
+    # ---------- results from worker processes ----------
+
+    # records & raw cProfile stats collected so far, to be sent back to the main process (and cleared here)
+    def export(self):
+        stats = {}
+        for name, profile in self.profiles.items():
+            profile.create_stats()
+            stats[name] = profile.stats
+        data = {'records': self.records, 'stats': stats}
+        self.records, self.profiles = [], {}
+        return data
+
+    def merge(self, data):
+        self.records.extend(data['records'])
+        for name, stats in data['stats'].items():
+            self.worker_stats.setdefault(name, []).append(stats)
+
+    # ---------- reports ----------
+
+    def report(self):
+        return pd.DataFrame(self.records, columns=COLUMNS)
+
+    # totals per stage (in order of first appearance), with each stage's share of the total wall time
+    def summary(self):
+        report = self.report()
+        summary = report.groupby('stage', sort=False).agg(**{
+            'calls': ('wall seconds', 'size'), 'wall seconds': ('wall seconds', 'sum'),
+            'cpu seconds': ('cpu seconds', 'sum'), 'mean wall seconds': ('wall seconds', 'mean'),
+            'max wall seconds': ('wall seconds', 'max'), 'allocated blocks': ('allocated blocks', 'sum'),
+            'allocated MB': ('allocated MB', 'sum'), 'peak MB': ('peak MB', 'max')})
+        summary['wall share'] = summary['wall seconds'] / summary['wall seconds'].sum()
+        return summary
+
+    # JSON (options, summary & records) or CSV (records), depending on the extension of path
+    def save(self, path):
+        if path.endswith('.csv'):
+            self.report().to_csv(path, index=False)
+            return
+        report = {'options': self.options, 'summary': self.summary().reset_index().to_dict(orient='records'),
+                  'records': self.report().to_dict(orient='records')}
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1, default=str)
+
+    # cProfile stats of a stage (merged over the worker processes), as a pstats.Stats object
+    def profile_stats(self, name):
+        profiles = ([self.profiles[name]] if name in self.profiles else []) + self.worker_stats.get(name, [])
+        return pstats.Stats(*[_Profile(p) for p in profiles])
+
+    # <directory>/<stage>.prof for each profiled stage
+    def save_profiles(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name in dict.fromkeys(list(self.profiles) + list(self.worker_stats)):
+            path = os.path.join(directory, f'{name}.prof')
+            self.profile_stats(name).dump_stats(path)
+            paths.append(path)
+        return paths
+
+# wraps a cProfile profiler or its raw stats so that pstats.Stats can load it
+class _Profile:
+    def __init__(self, profile):
+        self.profile = profile
+
+    def create_stats(self):
+        if isinstance(self.profile, cProfile.Profile):
+            self.profile.create_stats()
+            self.stats = self.profile.stats
+        else:
+            # a copy, pstats merges the other profiles into the first one
+            self.stats = dict(self.profile)
+
+# stage context of an optional profiler
+def stage(profiler, name, ticker=None):
+    return nullcontext() if profiler is None else profiler.stage(name, ticker)
+
+# summary table of a report saved with PipelineProfiler.save (JSON or CSV)
+def load_report(path):
+    if path.endswith('.csv'):
+        profiler = PipelineProfiler()
+        profiler.records = pd.read_csv(path).to_dict(orient='records')
+        return profiler.summary()
+    with open(path) as f:
+        return pd.DataFrame(json.load(f)['summary']).set_index('stage')
+
+# wall & CPU time of each stage in two reports (paths or summary tables) and the relative change
+def compare_reports(before, after):
+    before = load_report(before) if isinstance(before, str) else before
+    after = load_report(after) if isinstance(after, str) else after
+    comparison = pd.concat({'before': before[['wall seconds','cpu seconds']],
+                            'after': after[['wall seconds','cpu seconds']]}, axis=1)
+    comparison[('change', 'wall')] = comparison[('after', 'wall seconds')] / comparison[('before', 'wall seconds')] - 1
+    comparison[('change', 'cpu')] = comparison[('after', 'cpu seconds')] / comparison[('before', 'cpu seconds')] - 1
+    return comparison
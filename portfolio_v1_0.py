@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+from long_short_screen_v1_3 import position_tracker, calculateMaxDD
+from signal_rules_v1_0 import EMA_VORTEX_SSL_RULES
+from TA_panel_v1_0 import percent_change_panel, ATR_panel, EMA_panel, SSL_panel, vortex_panel, unpack
+
+# Cross-sectional portfolio backtest: the screened tickers traded together as one book.
+#
+# positions is a (bars x tickers) matrix of position trackers (1 long, -1 short, 0 flat, already shifted by one
+# bar as returned by position_tracker). On every bar the tickers in position are weighted by one of the schemes
+#     'equal'        the same weight for every ticker in position
+#     'volatility'   weights inversely proportional to the ticker's ATR / Close (volatility scaled)
+# optionally only keeping the top_n tickers with the strongest score in the direction of their position
+# (score * position), and scaled to a total gross exposure of `gross`.
+# The book earns the weighted close-to-close returns of its tickers; the bid/ask spread is charged on the turnover
+# (sum of the absolute weight changes) and the financing costs (fees per annum) on the gross exposure. Unlike
+# leg_returns there are no open-price adjustments on entry & exit days: every trade is at the close.
+# No look-ahead: atr, close and score are given as of each bar's close, like the signals, and the weights of bar t
+# use their values at the close of bar t - 1 (they are shifted by one bar here, as position_tracker shifts the
+# trackers), so the weights are known before the return of bar t is earned.
+#
+# The matrices are processed in blocks of chunk_bars bars, so the memory of the temporaries stays bounded
+# whatever the length of the history; the inputs can be float32 or memory-mapped arrays.
+
+PORTFOLIO_COLUMNS = ['Gross Return','Turnover','Spread Cost','Financing Cost','Net Return','Gross Exposure',
+                     'Net Exposure','Names','Equity']
+
+# rows `block` of x shifted by one bar (NaN on the first bar), i.e. the values known at the prior close
+def _prior_close(x, block):
+    if x is None:
+        return None
+    start = block.start
+    rows = np.asarray(x[max(start - 1, 0):block.stop - 1], dtype=float)
+    if start == 0:
+        rows = np.concatenate([np.full((1,) + rows.shape[1:], np.nan), rows])
+    return rows
+
+# weights of one block of bars
+def _weights(positions, scheme, volatility, score, top_n, gross):
+    positions = np.asarray(positions, dtype=float)
+    held = positions != 0
+    if scheme == 'equal':
+        raw = np.where(held, 1.0, 0.0)
+    elif scheme == 'volatility':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            raw = np.where(held & (volatility > 0), 1 / volatility, 0.0)
+        raw = np.where(np.isfinite(raw), raw, 0.0)
+    else:
+        raise ValueError(f'unknown weighting scheme {scheme!r}')
+
+    if top_n is not None:
+        strength = np.where((raw > 0) & np.isfinite(score), score * positions, -np.inf)
+        rank = np.argsort(np.argsort(-strength, axis=1, kind='stable'), axis=1, kind='stable')
+        raw = np.where((rank < top_n) & (strength > -np.inf), raw, 0.0)
+
+    total = raw.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total > 0, gross * raw / total, 0.0) * positions
+
+# per-bar portfolio returns & costs, and the KPIs of long_short_screen for the book:
+# returns (portfolio DataFrame, max drawdown, max drawdown duration, max drawdown day, Sharpe ratio, CAGR).
+# atr & close (bars x tickers) are needed for scheme='volatility', score for top_n. out: optional (bars x tickers)
+# array receiving the weights. atr, close & score are the values at each bar's close, lagged one bar here (see above).
+def portfolio_backtest(positions, pct_change, spread=0.005, fees=0.05, scheme='equal', atr=None, close=None,
+                       score=None, top_n=None, gross=1.0, chunk_bars=2520, index=None, out=None):
+    if isinstance(positions, pd.DataFrame):
+        index = positions.index if index is None else index
+    positions, pct_change = np.asarray(positions), np.asarray(pct_change)
+    atr, close, score = (None if x is None else np.asarray(x) for x in (atr, close, score))
+    if scheme == 'volatility' and (atr is None or close is None):
+        raise ValueError("scheme='volatility' needs atr and close")
+    if top_n is not None and score is None:
+        raise ValueError('top_n needs a score')
+    n, k = positions.shape
+
+    columns = {c: np.zeros(n) for c in PORTFOLIO_COLUMNS[:-1]}
+    prev_weights = np.zeros(k)
+    for start in range(0, n, chunk_bars):
+        block = slice(start, min(start + chunk_bars, n))
+        volatility = None if scheme != 'volatility' else _prior_close(atr, block) / _prior_close(close, block)
+        weights = _weights(positions[block], scheme, volatility, _prior_close(score, block), top_n, gross)
+        if out is not None:
+            out[block] = weights
+
+        returns = np.asarray(pct_change[block], dtype=float)
+        columns['Gross Return'][block] = np.where(weights != 0, weights * returns, 0).sum(axis=1)
+        changes = np.abs(np.diff(weights, axis=0, prepend=prev_weights[None, :]))
+        columns['Turnover'][block] = changes.sum(axis=1)
+        columns['Gross Exposure'][block] = np.abs(weights).sum(axis=1)
+        columns['Net Exposure'][block] = weights.sum(axis=1)
+        columns['Names'][block] = (weights != 0).sum(axis=1)
+        prev_weights = weights[-1]
+
+    columns['Spread Cost'] = spread * columns['Turnover']
+    columns['Financing Cost'] = (fees/365) * columns['Gross Exposure']
+    columns['Net Return'] = columns['Gross Return'] - columns['Spread Cost'] - columns['Financing Cost']
+    equity = np.cumprod(1 + columns['Net Return'])
+    portfolio = pd.DataFrame(columns, index=index)
+    portfolio['Equity'] = equity
+
+    # KPIs as in screen_kpis (2.5% risk-free rate, 252 trading days per year)
+    maxDrawdown, maxDrawdownDuration, maxDrawdownDay = calculateMaxDD(equity)
+    excessRet = columns['Net Return'] - (0.025/252)
+    sharpeRatio = np.sqrt(252) * np.mean(excessRet)/np.std(excessRet)
+    cagr = equity[-1]**(1/(n/252))-1
+    day = maxDrawdownDay if index is None else str(index[maxDrawdownDay])[:10]
+    return portfolio, maxDrawdown, maxDrawdownDuration, day, sharpeRatio, cagr
+
+# inputs of portfolio_backtest for the EMA / vortex / SSL strategy of the multistock backtester, computed on a
+# panel (TA_panel_v1_0) for the whole universe: positions (long + short trackers), pct_change, atr, close and the
+# vortex spread VI+ - VI- as the score, all as wide DataFrames on the panel's date index. atr, close & score are
+# the values at each bar's close (portfolio_backtest lags them one bar, as the trackers).
+# bars where a ticker has no data don't trigger signals (and have no return), its tracker is carried over them.
+def ema_vortex_ssl_positions(panel, ema_period=20, ssl_period=20, vortex_period=10, atr_period=14):
+    close = unpack(panel, panel['Close'])
+    ema = EMA_panel(panel, ema_period)
+    ssl = SSL_panel(panel, ssl_period)
+    vi = vortex_panel(panel, vortex_period)
+
+    long_entry, long_exit, short_entry, short_exit = EMA_VORTEX_SSL_RULES.signals(
+        {'Close': close, 'EMA': ema, 'VI+': vi['VI+'], 'VI-': vi['VI-'], 'SSL Up': ssl['SSL Up'], 'SSL Down': ssl['SSL Down']})
+    positions = position_tracker(long_entry, long_exit, 1) + position_tracker(short_entry, short_exit, -1)
+
+    return {'positions': pd.DataFrame(positions, index=close.index, columns=close.columns),
+            'pct_change': percent_change_panel(panel).fillna(0), 'atr': ATR_panel(panel, atr_period)['ATR'],
+            'close': close, 'score': vi['VI+'] - vi['VI-']}
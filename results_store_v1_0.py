@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+# Local results store for universe runs, so a run can be resumed after a crash and its results queried later
+# without recomputing anything.
+#
+# Layout under root:
+#     <root>/results.sqlite                               runs (run ID, start time, parameters as JSON),
+#                                                         KPIs (one row per run & ticker) and trades
+#     <root>/<run ID>/<ticker>/Date.i8                    dates of the equity curves as int64 nanoseconds
+#     <root>/<run ID>/<ticker>/Equity.f8 (or .f4)         equity curves, bars x 3 (long, short, long & short)
+# The equity files of a ticker are written first and its KPI row last, in one transaction with its trades, so a
+# ticker is done once its KPI row exists; the files of a ticker interrupted half-way are overwritten when the run
+# is resumed. Equity curves are read back with memory mapping.
+#
+#     summary, equity = run_universe(frames, store='results', run_id='ema_vortex_ssl')   # resumes if interrupted
+#     summary, equity = load_run('results', 'ema_vortex_ssl')
+
+KPI_COLUMNS = ['Max Drawdown','Max Drawdown Duration','Max Drawdown Day','Sharpe Ratio','CAGR']
+EQUITY_COLUMNS = ['Equity - Long','Equity - Short','Equity - Long & Short']
+DATABASE = 'results.sqlite'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, started TEXT, parameters TEXT);
+CREATE TABLE IF NOT EXISTS kpis (run_id TEXT, ticker TEXT, "Max Drawdown" REAL, "Max Drawdown Duration" REAL,
+                                 "Max Drawdown Day" TEXT, "Sharpe Ratio" REAL, "CAGR" REAL,
+                                 PRIMARY KEY (run_id, ticker));
+CREATE TABLE IF NOT EXISTS trades (run_id TEXT, ticker TEXT, "Side" TEXT, "Entry Date" TEXT, "Entry Price" REAL,
+                                   "Exit Date" TEXT, "Exit Price" REAL, "Holding Period" INTEGER, "Return" REAL,
+                                   "Open" INTEGER);
+CREATE INDEX IF NOT EXISTS trades_run ON trades (run_id, ticker);
+'''
+
+def _connect(root):
+    os.makedirs(root, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(root, DATABASE))
+    connection.executescript(_SCHEMA)
+    return connection
+
+def _equity_dir(root, run_id, ticker):
+    return os.path.join(root, run_id, ticker)
+
+# register a run (run_id defaults to the start time), or check that a run being resumed has the same parameters.
+# parameters: JSON-serialisable dictionary (spread, fees, strategy ...). returns the run ID.
+def start_run(root, run_id=None, parameters=None):
+    run_id = time.strftime('%Y%m%d-%H%M%S') if run_id is None else run_id
+    parameters = json.dumps(parameters or {}, sort_keys=True, default=str)
+    connection = _connect(root)
+    try:
+        with connection:
+            row = connection.execute('SELECT parameters FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+            if row is None:
+                connection.execute('INSERT INTO runs VALUES (?, ?, ?)',
+                                   (run_id, time.strftime('%Y-%m-%d %H:%M:%S'), parameters))
+            elif row[0] != parameters:
+                raise ValueError(f'run {run_id!r} was started with other parameters: {row[0]}')
+    finally:
+        connection.close()
+    return run_id
+
+# runs in the store: run ID, start time, parameters and number of tickers done
+def list_runs(root):
+    if not os.path.exists(os.path.join(root, DATABASE)):
+        return pd.DataFrame(columns=['Run ID','Started','Parameters','Tickers'])
+    connection = _connect(root)
+    try:
+        rows = connection.execute('SELECT runs.run_id, started, parameters, COUNT(ticker) FROM runs '
+                                  'LEFT JOIN kpis ON kpis.run_id = runs.run_id GROUP BY runs.run_id '
+                                  'ORDER BY started').fetchall()
+    finally:
+        connection.close()
+    runs = pd.DataFrame(rows, columns=['Run ID','Started','Parameters','Tickers'])
+    runs['Parameters'] = runs['Parameters'].map(json.loads)
+    return runs
+
+# tickers of a run that are already done
+def done_tickers(root, run_id):
+    if not os.path.exists(os.path.join(root, DATABASE)):
+        return set()
+    connection = _connect(root)
+    try:
+        return {row[0] for row in connection.execute('SELECT ticker FROM kpis WHERE run_id = ?', (run_id,))}
+    finally:
+        connection.close()
+
+def _write_equity(root, run_id, ticker, equity):
+    directory = _equity_dir(root, run_id, ticker)
+    os.makedirs(directory, exist_ok=True)
+    values = equity[EQUITY_COLUMNS].to_numpy()
+    values = values.astype(np.float32 if values.dtype == np.float32 else np.float64)
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    with open(os.path.join(directory, 'Equity.f4' if values.dtype == np.float32 else 'Equity.f8'), 'wb') as f:
+        f.write(np.ascontiguousarray(values).tobytes())
+    with open(os.path.join(directory, 'Date.i8'), 'wb') as f:
+        f.write(equity.index.values.astype('datetime64[ns]').view(np.int64).tobytes())
+
+# save the results of some tickers of a run: results is a list of (ticker, kpis, equity) or
+# (ticker, kpis, equity, ledger) with the KPIs in the order of KPI_COLUMNS and equity as returned by
+# long_short_screen. The KPI & trade rows of all of them are committed together.
+def save_results(root, run_id, results):
+    for result in results:
+        _write_equity(root, run_id, result[0], result[2])
+    connection = _connect(root)
+    try:
+        with connection:
+            for result in results:
+                ticker, kpis = result[0], result[1]
+                connection.execute('DELETE FROM trades WHERE run_id = ? AND ticker = ?', (run_id, ticker))
+                connection.execute('INSERT OR REPLACE INTO kpis VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                   (run_id, ticker) + tuple(k.item() if isinstance(k, np.generic) else k for k in kpis))
+                if len(result) > 3 and len(result[3]):
+                    ledger = result[3].copy()
+                    for column in ('Entry Date','Exit Date'):
+                        ledger[column] = ledger[column].astype(str)
+                    ledger.insert(0, 'ticker', ticker)
+                    ledger.insert(0, 'run_id', run_id)
+                    connection.executemany(f'INSERT INTO trades VALUES ({", ".join("?" * ledger.shape[1])})',
+                                           ledger.astype(object).itertuples(index=False, name=None))
+    finally:
+        connection.close()
+
+# KPI summary of a run (one row per ticker done, in the order they were saved unless tickers are given)
+def load_summary(root, run_id, tickers=None):
+    connection = _connect(root)
+    try:
+        summary = pd.read_sql_query('SELECT * FROM kpis WHERE run_id = ? ORDER BY rowid', connection, params=(run_id,))
+    finally:
+        connection.close()
+    summary = summary.drop(columns='run_id').rename(columns={'ticker': 'Ticker'}).set_index('Ticker')
+    return summary if tickers is None else summary.reindex(list(tickers))
+
+# trade ledger of a run (all tickers, or some of them), with a Ticker column as run_universe(..., trades=True)
+def load_trades(root, run_id, tickers=None):
+    connection = _connect(root)
+    try:
+        ledger = pd.read_sql_query('SELECT * FROM trades WHERE run_id = ? ORDER BY rowid', connection, params=(run_id,))
+    finally:
+        connection.close()
+    ledger = ledger.drop(columns='run_id').rename(columns={'ticker': 'Ticker'})
+    for column in ('Entry Date','Exit Date'):
+        ledger[column] = pd.to_datetime(ledger[column])
+    ledger['Open'] = ledger['Open'].astype(bool)
+    if tickers is not None:
+        ledger = ledger[ledger['Ticker'].isin(list(tickers))].reset_index(drop=True)
+    return ledger
+
+# equity curves of one ticker of a run as a DataFrame on the memory-mapped file (no copy)
+def load_equity(root, run_id, ticker):
+    directory = _equity_dir(root, run_id, ticker)
+    dates = np.memmap(os.path.join(directory, 'Date.i8'), dtype=np.int64, mode='r')
+    if os.path.exists(os.path.join(directory, 'Equity.f4')):
+        path, dtype = os.path.join(directory, 'Equity.f4'), np.float32
+    else:
+        path, dtype = os.path.join(directory, 'Equity.f8'), np.float64
+    values = np.memmap(path, dtype=dtype, mode='r', shape=(len(dates), len(EQUITY_COLUMNS)))
+    return pd.DataFrame(values, index=pd.DatetimeIndex(dates.view('datetime64[ns]'), name='Date'),
+                        columns=EQUITY_COLUMNS, copy=False)
+
+# the KPI summary and the dictionary of ticker -> equity curves of a run, as returned by run_universe
+def load_run(root, run_id, tickers=None):
+    summary = load_summary(root, run_id, tickers)
+    return summary, {ticker: load_equity(root, run_id, ticker) for ticker in summary.index}
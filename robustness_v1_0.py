@@ -0,0 +1,132 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from long_short_screen_v1_3 import calculateMaxDD
+from multistock_runner_v1_0 import EMA_VORTEX_SSL
+from walk_forward_v1_0 import leg_daily_returns
+
+# Bootstrap / Monte Carlo robustness of the screen: how much of a ticker's Sharpe ratio, CAGR and max drawdown
+# could be luck. The daily returns of the long & short legs (leg_returns, as in long_short_screen) are resampled
+# into thousands of paths of the same length, and the KPIs of screen_kpis are computed for every path:
+#     method='block'   moving block bootstrap: blocks of `block` consecutive bars drawn with replacement, the same
+#                      bars for both legs (keeps the short-term autocorrelation and the link between the legs)
+#     method='trades'  trade shuffle: the trades and the flat periods between them are put in a random order, each
+#                      leg on its own (same trades & total return per leg, different paths & drawdowns)
+# The paths are index matrices (bars x paths) gathered from the returns in one operation, processed in chunks of
+# paths sized to stay under max_mb of temporaries; every ticker has its own random generator, seeded from the seed
+# and the ticker itself (its name, not its position), so the results depend neither on the chunk size nor on the
+# other tickers.
+#
+#     returns = universe_returns(frames)                          # ticker -> (pct_change_long, pct_change_short)
+#     distributions, observed = robustness(returns, n_paths=10000, block=20, seed=0)
+#     robustness_summary(distributions, observed)
+
+KPIS = ['Sharpe Ratio','CAGR','Max Drawdown']
+# (bars x paths) arrays alive at once per path chunk: indices, gathered returns, equity curves & drawdown temporaries
+_ARRAYS_PER_PATH = 14
+
+# daily returns of the long & short legs of every ticker (see walk_forward_v1_0.leg_daily_returns)
+def universe_returns(frames, strategy=EMA_VORTEX_SSL, spread=0.005, fees=0.05):
+    return {ticker: leg_daily_returns(df, strategy, spread, fees) for ticker, df in frames.items()}
+
+# moving block bootstrap: (bars x paths) row indices made of blocks of `block` bars with random starts
+def block_bootstrap_index(n_bars, n_paths, block, rng):
+    block = max(1, min(block, n_bars))
+    n_blocks = -(-n_bars // block)
+    starts = rng.integers(0, n_bars - block + 1, size=(n_paths, n_blocks))
+    index = (starts[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :n_bars]
+    return index.T
+
+# runs of bars in position (non-zero returns: leg_returns charges the financing costs on every bar in position)
+# and flat runs between them: (first bar, length) of each run
+def trade_segments(leg_pct_change):
+    in_position = np.asarray(leg_pct_change) != 0
+    bounds = np.flatnonzero(np.diff(in_position)) + 1
+    starts = np.concatenate([[0], bounds])
+    lengths = np.diff(np.append(starts, len(in_position)))
+    return starts, lengths
+
+# trade shuffle: (bars x paths) row indices putting the runs of trade_segments in a random order on every path
+def trade_shuffle_index(starts, lengths, n_paths, rng):
+    order = np.argsort(rng.random((n_paths, len(starts))), axis=1)
+    lengths_out = lengths[order]
+    segment = np.repeat(order.ravel(), lengths_out.ravel())
+    first_out = np.repeat((np.cumsum(lengths_out, axis=1) - lengths_out).ravel(), lengths_out.ravel())
+    n_bars = lengths.sum()
+    offset = np.tile(np.arange(n_bars), n_paths) - first_out
+    return (starts[segment] + offset).reshape(n_paths, n_bars).T
+
+# KPIs of screen_kpis on paths of the legs' returns given as (bars x paths) row indices of each leg
+def path_kpis(pct_change_long, pct_change_short, index_long, index_short=None, bars_per_year=252):
+    index_short = index_long if index_short is None else index_short
+    long_paths = np.asarray(pct_change_long, dtype=float)[index_long]
+    short_paths = np.asarray(pct_change_short, dtype=float)[index_short]
+    equity_net = 0.5 * (np.cumprod(1 + long_paths, axis=0) + np.cumprod(1 + short_paths, axis=0))
+    maxDD, _, _ = calculateMaxDD(equity_net)
+
+    excessRet = 0.5 * (long_paths + short_paths) - (0.025/bars_per_year)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpeRatio = np.sqrt(bars_per_year) * np.mean(excessRet, axis=0)/np.std(excessRet, axis=0)
+    cagr = equity_net[-1]**(1/(len(equity_net)/bars_per_year))-1
+    return {'Sharpe Ratio': sharpeRatio, 'CAGR': cagr, 'Max Drawdown': maxDD}
+
+# seed sequence of one ticker: the same for a ticker whatever the other tickers of the run
+def _ticker_seed(seed, ticker):
+    return np.random.SeedSequence([seed, zlib.crc32(str(ticker).encode())])
+
+# distributions of the KPIs over n_paths resampled paths for every ticker of returns (dictionary of ticker ->
+# (pct_change_long, pct_change_short), or one such pair): returns (dictionary of KPI -> DataFrame tickers x paths,
+# DataFrame of the observed KPIs of every ticker). the NaN return of the first bar counts as 0, as in the equity
+# curves of long_short_screen.
+def robustness(returns, method='block', n_paths=10000, block=20, seed=0, max_mb=256, bars_per_year=252):
+    if isinstance(returns, tuple):
+        returns = {0: returns}
+    if method not in ('block', 'trades'):
+        raise ValueError(f'unknown resampling method {method!r}')
+    tickers = list(returns.keys())
+    distributions = {kpi: np.full((len(tickers), n_paths), np.nan) for kpi in KPIS}
+    observed = {kpi: np.full(len(tickers), np.nan) for kpi in KPIS}
+    generators = [np.random.default_rng(_ticker_seed(seed, ticker)) for ticker in tickers]
+
+    for i, ticker in enumerate(tickers):
+        pct_change_long, pct_change_short = (np.nan_to_num(np.asarray(x, dtype=float)) for x in returns[ticker])
+        n_bars = len(pct_change_long)
+        if n_bars == 0:
+            continue
+        identity = np.arange(n_bars)[:, None]
+        for kpi, value in path_kpis(pct_change_long, pct_change_short, identity, bars_per_year=bars_per_year).items():
+            observed[kpi][i] = value[0]
+        if method == 'trades':
+            segments_long, segments_short = trade_segments(pct_change_long), trade_segments(pct_change_short)
+
+        chunk_paths = max(1, int(max_mb * 2**20 // (_ARRAYS_PER_PATH * 8 * n_bars)))
+        for start in range(0, n_paths, chunk_paths):
+            paths = min(chunk_paths, n_paths - start)
+            if method == 'block':
+                index_long = index_short = block_bootstrap_index(n_bars, paths, block, generators[i])
+            else:
+                index_long = trade_shuffle_index(*segments_long, paths, generators[i])
+                index_short = trade_shuffle_index(*segments_short, paths, generators[i])
+            kpis = path_kpis(pct_change_long, pct_change_short, index_long, index_short, bars_per_year)
+            for kpi in KPIS:
+                distributions[kpi][i, start:start + paths] = kpis[kpi]
+
+    index = pd.Index(tickers, name='Ticker')
+    return ({kpi: pd.DataFrame(values, index=index) for kpi, values in distributions.items()},
+            pd.DataFrame(observed, index=index))
+
+# per ticker: quantiles of each KPI over the paths and, with the observed KPIs, the share of paths doing at least
+# as well as the observed one (Sharpe & CAGR higher, drawdown shallower) and of paths with a Sharpe ratio <= 0
+def robustness_summary(distributions, observed=None, quantiles=(0.05, 0.5, 0.95)):
+    summary = {}
+    for kpi in KPIS:
+        values = distributions[kpi].to_numpy()
+        for q, column in zip(np.nanquantile(values, quantiles, axis=1), quantiles):
+            summary[f'{kpi} {column:.0%}'] = q
+        if observed is not None:
+            summary[f'{kpi} Observed'] = observed[kpi].to_numpy()
+            summary[f'{kpi} Paths >= Observed'] = np.mean(values >= observed[kpi].to_numpy()[:, None], axis=1)
+    summary['Paths Sharpe <= 0'] = np.mean(distributions['Sharpe Ratio'].to_numpy() <= 0, axis=1)
+    return pd.DataFrame(summary, index=distributions['Sharpe Ratio'].index)
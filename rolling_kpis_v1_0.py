@@ -0,0 +1,102 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Rolling-window KPIs over the last `window` bars, as time series, in one O(n) pass whatever the window:
+#     Sharpe Ratio   of the excess returns (as screen_kpis: 2.5% risk-free rate), from running sums of the returns
+#                    and of the squared returns
+#     Drawdown       equity / highest equity of the window - 1, with a running window maximum
+#     CAGR           from the equity at the end & before the start of the window
+# The inputs are 1-D (bars) or 2-D (bars x columns, e.g. the long, short and long & short equity curves of a
+# screen, or one column per ticker, whose histories may start or end at different bars: NaNs are left out of the
+# windows and a window with fewer than min_periods values (default: window) is NaN, as pandas' rolling windows.
+#
+#     rolling = screen_rolling_kpis(equity, window=252)     # equity as returned by long_short_screen
+#     rolling['Sharpe Ratio']['Equity - Long & Short'].plot()
+
+# maximum of the last `window` values of each column (van Herk / Gil-Werman: the running maximum from the start
+# and from the end of blocks of `window` bars, so every window is covered by the end of one block and the start of
+# the next one). NaNs are ignored.
+def rolling_max(values, window):
+    values = np.asarray(values, dtype=float)
+    n = values.shape[0]
+    blocks = -(-n // window)
+    padded = np.full((blocks * window,) + values.shape[1:], -np.inf)
+    padded[:n] = np.where(np.isnan(values), -np.inf, values)
+    padded = padded.reshape((blocks, window) + values.shape[1:])
+    from_start = np.maximum.accumulate(padded, axis=1).reshape((-1,) + values.shape[1:])
+    from_end = np.maximum.accumulate(padded[:, ::-1], axis=1)[:, ::-1].reshape((-1,) + values.shape[1:])
+
+    result = np.full(values.shape, np.nan)
+    if n >= window:
+        # window [t - window + 1, t]: the end of the block of its first bar & the start of the block of its last bar
+        result[window - 1:] = np.maximum(from_end[:n - window + 1], from_start[window - 1:n])
+    return np.where(np.isinf(result), np.nan, result)
+
+# sum of the last `window` values of each column from the running sums, NaNs counted as 0 (the first window - 1
+# bars are the sums of the bars so far)
+def _rolling_sum(values, window):
+    sums = np.cumsum(np.where(np.isnan(values), 0, values), axis=0)
+    result = sums.copy()
+    result[window:] -= sums[:-window]
+    return result
+
+# rolling KPIs of equity curves (starting from 1 before the first bar). returns: the per-bar returns used for the
+# Sharpe ratio, by default the percent changes of the equity. returns a dictionary of KPI -> series of the shape
+# (and index & columns if equity is a DataFrame) of equity. min_periods: fewest returns in a window for its Sharpe
+# ratio (default: window).
+def rolling_kpis(equity, window=252, returns=None, bars_per_year=252, risk_free=0.025, min_periods=None):
+    index = columns = None
+    if isinstance(equity, (pd.DataFrame, pd.Series)):
+        index, columns = equity.index, getattr(equity, 'columns', None)
+        name = getattr(equity, 'name', None)
+    values = np.asarray(equity, dtype=float)
+    if returns is None:
+        prev = np.concatenate([np.ones_like(values[:1]), values[:-1]])
+        returns = values / prev - 1
+    returns = np.asarray(returns, dtype=float)
+    min_periods = window if min_periods is None else min_periods
+
+    # Sharpe ratio: mean & standard deviation (ddof=0, as np.std) of the excess returns of the window, from the
+    # running sums of the returns less their overall mean (smaller sums, less cancellation) and the running count
+    # of the bars with a return
+    excessRet = returns - risk_free/bars_per_year
+    valid = ~np.isnan(excessRet)
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)     # columns without any return
+        shift = np.nan_to_num(np.nanmean(excessRet, axis=0)) if len(excessRet) else 0.0
+    centred = np.where(valid, excessRet - shift, np.nan)
+    count = _rolling_sum(valid.astype(float), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = _rolling_sum(centred, window) / count
+        variance = np.maximum(_rolling_sum(centred**2, window) / count - mean**2, 0)
+        sharpe = np.sqrt(bars_per_year) * (mean + shift) / np.sqrt(variance)
+    sharpe[count < max(min_periods, 1)] = np.nan
+
+    # drawdown from the highest equity of the window
+    drawdown = values / rolling_max(values, window) - 1
+
+    # CAGR of the window: equity growth since the bar before it
+    before = np.concatenate([np.ones_like(values[:1]), values[:-window]]) if len(values) >= window else values[:0]
+    cagr = np.full(values.shape, np.nan)
+    cagr[window - 1:] = (values[window - 1:] / before)**(bars_per_year / window) - 1
+
+    kpis = {'Sharpe Ratio': sharpe, 'Drawdown': drawdown, 'CAGR': cagr}
+    if index is None:
+        return kpis
+    if columns is None:
+        return {kpi: pd.Series(series, index=index, name=name) for kpi, series in kpis.items()}
+    return {kpi: pd.DataFrame(series, index=index, columns=columns) for kpi, series in kpis.items()}
+
+# rolling KPIs of the three equity curves of long_short_screen (or of the equity dictionary of run_universe: one
+# DataFrame per ticker); the Sharpe ratio of the long & short column is computed on the average of the legs' returns,
+# as in screen_kpis
+def screen_rolling_kpis(equity, window=252, bars_per_year=252):
+    if isinstance(equity, dict):
+        return {ticker: screen_rolling_kpis(e, window, bars_per_year) for ticker, e in equity.items()}
+    legs = equity[['Equity - Long','Equity - Short']].to_numpy(dtype=float)
+    returns = legs / np.concatenate([np.ones_like(legs[:1]), legs[:-1]]) - 1
+    returns = np.column_stack([returns, 0.5 * (returns[:, 0] + returns[:, 1])])
+    return rolling_kpis(equity[['Equity - Long','Equity - Short','Equity - Long & Short']], window, returns,
+                        bars_per_year)
@@ -0,0 +1,203 @@
+import re
+import numpy as np
+
+# Entry & exit rules as expressions, compiled once into one graph of operations shared by all the rules:
+#
+#     rules = RuleSet(long_entry  = '[Close] > [EMA] & [VI+] > [VI-] & [SSL Up] > [SSL Down]',
+#                     long_exit   = '[SSL Up] < [SSL Down]',
+#                     short_entry = '[Close] < [EMA] & [VI-] > [VI+] & [SSL Down] > [SSL Up]',
+#                     short_exit  = '[SSL Down] < [SSL Up]')
+#     long_short_screen(df, *rules.signals(df), spread, fees)
+#
+# Columns are written in brackets (or as plain names when they have no spaces or symbols), with the operators
+#     |  or       &  and       ~  not       >  <  >=  <=  ==  !=       +  -  *  /       ( )       numbers
+# in increasing order of precedence for the logical ones (& binds tighter than |, comparisons tighter than &, so
+# no parentheses are needed around comparisons, unlike pandas).
+# Identical subexpressions are evaluated once for all the rules: a < b is the same node as b > a, and the operands
+# of &, |, ==, !=, + and * are sorted, so above [SSL Up] > [SSL Down] and [SSL Down] > [SSL Up] are evaluated
+# once each for the four rules, and [Close] > [EMA] / [Close] < [EMA] once each.
+# Rules are evaluated on 1-D (bars) or 2-D (bars x tickers, e.g. panel fields) arrays, in blocks of rows so that
+# the intermediate arrays stay small, into bool (or int8) arrays. Comparisons with NaN are False, as in pandas.
+
+_TOKEN = re.compile(r'\s*(?:\[([^\]]+)\]|(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|(>=|<=|==|!=|[><&|~+\-*/()])'
+                    r'|([A-Za-z_][A-Za-z_0-9]*))')
+_KEYWORDS = {'and': '&', 'or': '|', 'not': '~'}
+_SWAPPED = {'<': '>', '<=': '>='}
+_COMMUTATIVE = {'&', '|', '==', '!=', '+', '*'}
+_BINARY = {'>': np.greater, '>=': np.greater_equal, '==': np.equal, '!=': np.not_equal,
+           '+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide}
+
+def _tokenize(text):
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None or match.end() == pos:
+            raise ValueError(f'cannot parse {text[pos:]!r} in rule {text!r}')
+        column, number, op, name = match.groups()
+        if column is not None:
+            tokens.append(('column', column.strip()))
+        elif number is not None:
+            tokens.append(('number', float(number)))
+        elif op is not None:
+            tokens.append(('op', op))
+        elif name in _KEYWORDS:
+            tokens.append(('op', _KEYWORDS[name]))
+        else:
+            tokens.append(('column', name))
+        pos = match.end()
+    return tokens
+
+class RuleSet:
+    def __init__(self, **rules):
+        # nodes in evaluation order: ('column', name), ('number', value), (op, operand ids...); _ids for the sharing
+        self.nodes = []
+        self._ids = {}
+        self.rules = {name: self._parse(text) for name, text in rules.items()}
+        self.texts = dict(rules)
+        self.columns = [node[1] for node in self.nodes if node[0] == 'column']
+
+        # rules computed by each node
+        self._outputs = {}
+        for name, node in self.rules.items():
+            self._outputs.setdefault(node, []).append(name)
+        # last node using each node, to free the intermediate arrays as soon as possible
+        self._last_use = {}
+        for i, node in enumerate(self.nodes):
+            if node[0] not in ('column', 'number'):
+                for operand in node[1:]:
+                    self._last_use[operand] = i
+
+    # ---------- parsing ----------
+
+    def _node(self, node):
+        if node[0] in _SWAPPED:
+            node = (_SWAPPED[node[0]], node[2], node[1])
+        elif node[0] in _COMMUTATIVE:
+            node = (node[0],) + tuple(sorted(set(node[1:]) if node[0] in ('&', '|') else node[1:]))
+            if len(node) == 2:
+                return node[1]
+        if node not in self._ids:
+            self._ids[node] = len(self.nodes)
+            self.nodes.append(node)
+        return self._ids[node]
+
+    def _parse(self, text):
+        self._tokens, self._pos, self._text = _tokenize(text), 0, text
+        node = self._or()
+        if self._pos != len(self._tokens):
+            raise ValueError(f'unexpected {self._tokens[self._pos][1]!r} in rule {text!r}')
+        return node
+
+    def _peek(self, *ops):
+        if self._pos < len(self._tokens) and self._tokens[self._pos][0] == 'op' and self._tokens[self._pos][1] in ops:
+            self._pos += 1
+            return self._tokens[self._pos - 1][1]
+        return None
+
+    # & and | are n-ary, so that a & b & c shares its operands with any other order of them
+    def _logical(self, op, operand):
+        operands = [operand()]
+        while self._peek(op):
+            operands.append(operand())
+        if len(operands) == 1:
+            return operands[0]
+        flat = []
+        for node in operands:
+            flat.extend(self.nodes[node][1:] if self.nodes[node][0] == op else [node])
+        return self._node((op,) + tuple(flat))
+
+    def _or(self):
+        return self._logical('|', self._and)
+
+    def _and(self):
+        return self._logical('&', self._not)
+
+    def _not(self):
+        if self._peek('~'):
+            return self._node(('~', self._not()))
+        return self._comparison()
+
+    def _comparison(self):
+        left = self._sum()
+        op = self._peek('>', '<', '>=', '<=', '==', '!=')
+        return left if op is None else self._node((op, left, self._sum()))
+
+    def _sum(self):
+        node = self._term()
+        while (op := self._peek('+', '-')):
+            node = self._node((op, node, self._term()))
+        return node
+
+    def _term(self):
+        node = self._unary()
+        while (op := self._peek('*', '/')):
+            node = self._node((op, node, self._unary()))
+        return node
+
+    def _unary(self):
+        if self._peek('-'):
+            return self._node(('neg', self._unary()))
+        return self._atom()
+
+    def _atom(self):
+        if self._peek('('):
+            node = self._or()
+            if not self._peek(')'):
+                raise ValueError(f'missing ) in rule {self._text!r}')
+            return node
+        if self._pos >= len(self._tokens) or self._tokens[self._pos][0] == 'op':
+            raise ValueError(f'operand expected in rule {self._text!r}')
+        kind, value = self._tokens[self._pos]
+        self._pos += 1
+        return self._node((kind, value))
+
+    # ---------- evaluation ----------
+
+    def _evaluate_block(self, arrays, rows, outputs):
+        values = {}
+        for i, node in enumerate(self.nodes):
+            kind = node[0]
+            if kind == 'column':
+                values[i] = arrays[node[1]][rows]
+            elif kind == 'number':
+                values[i] = node[1]
+            elif kind in ('&', '|'):
+                func = np.logical_and if kind == '&' else np.logical_or
+                result = func(values[node[1]], values[node[2]])
+                for operand in node[3:]:
+                    func(result, values[operand], out=result)
+                values[i] = result
+            elif kind == '~':
+                values[i] = np.logical_not(values[node[1]])
+            elif kind == 'neg':
+                values[i] = np.negative(values[node[1]])
+            else:
+                values[i] = _BINARY[kind](values[node[1]], values[node[2]])
+            for operand in node[1:] if kind not in ('column', 'number') else ():
+                if self._last_use.get(operand) == i:
+                    values.pop(operand, None)
+            for name in self._outputs.get(i, ()):
+                outputs[name][rows] = values[i]
+
+    # the rules evaluated on data (DataFrame, dictionary of arrays / wide DataFrames or a panel): a dictionary of
+    # rule name -> bool (or int8) array with the shape of the columns. block_rows rows are evaluated at a time.
+    def evaluate(self, data, dtype=bool, block_rows=4096):
+        arrays = {name: np.asarray(data[name], dtype=float) for name in self.columns}
+        shape = next(iter(arrays.values())).shape
+        outputs = {name: np.empty(shape, dtype=dtype) for name in self.rules}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for start in range(0, shape[0], block_rows):
+                self._evaluate_block(arrays, slice(start, start + block_rows), outputs)
+        return outputs
+
+    # the rules in the order they were given, e.g. (long entry, long exit, short entry, short exit) for
+    # long_short_screen(df, *rules.signals(df), spread, fees)
+    def signals(self, data, dtype=bool, block_rows=4096):
+        return tuple(self.evaluate(data, dtype, block_rows).values())
+
+# the rules of the EMA / vortex / SSL strategy of multistock_backtester.ipynb
+EMA_VORTEX_SSL_RULES = RuleSet(long_entry='[Close] > [EMA] & [VI+] > [VI-] & [SSL Up] > [SSL Down]',
+                               long_exit='[SSL Up] < [SSL Down]',
+                               short_entry='[Close] < [EMA] & [VI-] > [VI+] & [SSL Down] > [SSL Up]',
+                               short_exit='[SSL Down] < [SSL Up]')
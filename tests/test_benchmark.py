@@ -0,0 +1,19 @@
+import pandas as pd
+
+from benchmark_v1_0 import compare, run_suite
+
+# the gate doesn't fire on noise: a baseline compared with an immediate re-run on the same machine
+def test_rerun_has_no_regression():
+    options = dict(bars=(1_000, 10_000), tickers=(1, 10), repeat=3)
+    baseline = run_suite(**options)
+    comparison = compare(run_suite(**options), baseline)
+    assert len(comparison) == len(baseline)
+    assert not comparison['regressed'].any(), comparison[comparison['regressed']]
+
+def test_compare_flags_regressions():
+    baseline = pd.DataFrame({'seconds': [0.1, 0.001], 'peak MB': [10.0, 1.0]}, index=['slow', 'fast'])
+    results = pd.DataFrame({'seconds': [0.2, 0.003], 'peak MB': [10.0, 2.0]}, index=['slow', 'fast'])
+    comparison = compare(results, baseline)
+    # slow: 100% & 0.1 s slower; fast: 200% slower but by 2 ms only, twice the memory
+    assert comparison['regressed'].tolist() == [True, True]
+    assert compare(results.assign(**{'peak MB': [10.0, 1.0]}), baseline)['regressed'].tolist() == [True, False]
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from benchmark_v1_0 import synthetic_ohlcv
+from intraday_screen_v1_0 import intraday_screen, load_equity, screen_chunks
+from long_short_screen_v1_3 import infer_bars_per_year
+from ohlcv_store_v1_0 import write_bars
+
+@pytest.fixture
+def minute_store(tmp_path):
+    df = synthetic_ohlcv(20_000, seed=3, freq='min', volatility=0.001)
+    write_bars(str(tmp_path), 'MIN', df)
+    return str(tmp_path), df
+
+# the KPIs and equity curves don't depend on the chunk size when bars_per_year is inferred
+@pytest.mark.parametrize('chunk_bars', [7, 1000])
+def test_chunk_size_without_bars_per_year(minute_store, tmp_path, chunk_bars):
+    root, df = minute_store
+    whole = intraday_screen(root, 'MIN', chunk_bars=len(df), equity_path=str(tmp_path / 'whole.f8'))
+    chunked = intraday_screen(root, 'MIN', chunk_bars=chunk_bars, equity_path=str(tmp_path / 'chunked.f8'))
+    assert whole[2] == chunked[2] and len(whole[2]) == 10
+    np.testing.assert_allclose([whole[k] for k in (0, 1, 3, 4)], [chunked[k] for k in (0, 1, 3, 4)], rtol=1e-9)
+    np.testing.assert_array_equal(load_equity(str(tmp_path / 'whole.f8')), load_equity(str(tmp_path / 'chunked.f8')))
+
+    explicit = intraday_screen(root, 'MIN', chunk_bars=chunk_bars, bars_per_year=infer_bars_per_year(df.index))
+    np.testing.assert_allclose(explicit[3], whole[3], rtol=1e-9)
+
+def test_screen_chunks_needs_bars_per_year(minute_store):
+    _, df = minute_store
+    with pytest.raises(ValueError, match='bars_per_year'):
+        screen_chunks([df.iloc[:100], df.iloc[100:]])
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling_kpis_v1_0 import rolling_kpis
+
+# pandas' rolling Sharpe ratio of the excess returns, column by column (std with ddof=0 as np.std)
+def _pandas_sharpe(returns, window, min_periods, bars_per_year=252):
+    excess = returns - 0.025/bars_per_year
+    rolling = excess.rolling(window, min_periods=min_periods)
+    return np.sqrt(bars_per_year) * rolling.mean() / rolling.std(ddof=0)
+
+# histories starting late, ending early and with a gap: every column as its own pandas rolling window
+@pytest.mark.parametrize('min_periods', [None, 20])
+def test_sharpe_ragged_columns(min_periods):
+    rng = np.random.default_rng(0)
+    returns = pd.DataFrame(rng.normal(0.0005, 0.01, (600, 3)))
+    returns.iloc[:100, 1] = np.nan
+    returns.iloc[450:, 2] = np.nan
+    returns.iloc[200:230, 2] = np.nan
+    equity = (1 + returns.fillna(0)).cumprod().where(returns.notna())
+
+    sharpe = rolling_kpis(equity, window=50, returns=returns, min_periods=min_periods)['Sharpe Ratio']
+    expected = _pandas_sharpe(returns, 50, 50 if min_periods is None else min_periods)
+    assert np.isfinite(sharpe[1]).sum() == np.isfinite(expected[1]).sum() > 0
+    np.testing.assert_allclose(sharpe.to_numpy(), expected.to_numpy(), rtol=1e-9, atol=1e-12)
+
+# the default returns of an equity curve starting late: NaN before the first equity value, not everywhere after it
+def test_sharpe_late_start_default_returns():
+    rng = np.random.default_rng(1)
+    equity = np.cumprod(1 + rng.normal(0.0005, 0.01, (600, 2)), axis=0)
+    equity[:100, 1] = np.nan
+    sharpe = rolling_kpis(equity, window=50)['Sharpe Ratio']
+    assert np.isfinite(sharpe[:, 0]).sum() == 551
+    assert np.isfinite(sharpe[:, 1]).sum() == 450
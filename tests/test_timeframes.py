@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark_v1_0 import synthetic_ohlcv
+from timeframes_v1_0 import AGGREGATION, TimeframeCache, resample_bars
+
+def _pandas_bars(df, rule):
+    bars = df.resample(rule).agg({field: AGGREGATION[field] for field in df.columns})
+    return bars[bars['Close'].notna()]
+
+# one resample of the whole history, pandas' and this module's, for calendar, multi-day and intraday rules
+@pytest.mark.parametrize('rule, freq', [('W-FRI', 'B'), ('ME', 'B'), ('3D', 'B'), ('2D', 'D'), ('4h', 'h')])
+def test_resample_bars_as_pandas(rule, freq):
+    df = synthetic_ohlcv(400, seed=2, start='2001-01-03 09:00', freq=freq)
+    pd.testing.assert_frame_equal(resample_bars(df, rule), _pandas_bars(df, rule), check_freq=False)
+
+# updates in slices give the bars of one resample of the whole history
+@pytest.mark.parametrize('rule, freq', [('3D', 'B'), ('2D', 'D'), ('4h', 'h'), ('W-FRI', 'B')])
+def test_update_in_slices(rule, freq):
+    df = synthetic_ohlcv(400, seed=5, start='2001-01-03 09:00', freq=freq)
+    tf = TimeframeCache(df.iloc[:137])
+    tf.bars(rule)
+    # slices of many lengths, some of one bar, so that periods are split at every weekday & hour
+    cuts = [137, 251, 252, 253, 260, 271, 300, 301, 333, 365, 400]
+    for start, end in zip(cuts[:-1], cuts[1:]):
+        assert tf.update(df.iloc[start:end]) == end - start
+        tf.bars(rule)
+    pd.testing.assert_frame_equal(tf.bars(rule), TimeframeCache(df).bars(rule), check_freq=False)
+    pd.testing.assert_frame_equal(tf.bars(rule), _pandas_bars(df, rule), check_freq=False)
+    np.testing.assert_array_equal(tf.aligned(rule, 'Close').to_numpy(), TimeframeCache(df).aligned(rule, 'Close').to_numpy())
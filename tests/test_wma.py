@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark_v1_0 import synthetic_ohlcv
+from TA_indicators_v2_1 import WMA_array
+
+# the WMA of the notebooks: rolling apply of the weights 1 .. period
+def _rolling_wma(x, period):
+    weights = np.arange(1, period + 1)
+    return pd.Series(x).rolling(period).apply(lambda v: (v * weights).sum() / weights.sum(), raw=True).to_numpy()
+
+# the prefix sums don't lose precision along a long series: the last bars of 1M bars against the reference
+@pytest.mark.parametrize('period', [2, 20, 200])
+def test_long_series(period):
+    close = synthetic_ohlcv(1_000_000, seed=7)['Close'].to_numpy()
+    wma = WMA_array(close, period)
+    tail = 20_000
+    expected = _rolling_wma(close[-(tail + period - 1):], period)[period - 1:]
+    np.testing.assert_allclose(wma[-tail:], expected, rtol=1e-12)
+    assert np.isnan(wma[:period - 1]).all() and not np.isnan(wma[period - 1:]).any()
+
+# prices over many orders of magnitude
+def test_extreme_range():
+    x = np.exp(np.random.default_rng(3).uniform(-20, 20, 20_000))
+    np.testing.assert_allclose(WMA_array(x, 20), _rolling_wma(x, 20), rtol=1e-8)
+
+# several periods & tickers at once, with missing values
+def test_multi_period_missing():
+    x = synthetic_ohlcv(3000, seed=1)['Close'].to_numpy()
+    prices = np.column_stack([x, x[::-1]])
+    prices[:250, 0] = np.nan
+    prices[1000, 1] = np.nan
+    periods = [1, 3, 20, 50]
+    wma = WMA_array(prices, periods)
+    for j, period in enumerate(periods):
+        for t in range(2):
+            np.testing.assert_allclose(wma[:, t, j], _rolling_wma(prices[:, t], period), rtol=1e-12)
@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Day, Tick
+
+# Higher-timeframe (weekly, monthly, 4-hourly ...) bars built from the stored daily or intraday bars, with their
+# indicators aligned back to the base bars, instead of downloading every timeframe separately:
+#
+#     tf = TimeframeCache(df)                                           # one ticker's daily OHLCV DataFrame
+#     df['Weekly EMA'] = tf.indicator('W-FRI', EMA, 20)                 # any TA_indicators_v2_1 function
+#     df['Weekly Close'] = tf.aligned('W-FRI', 'Close')
+#     rules = RuleSet(long_entry='[Weekly Close] > [Weekly EMA] & [SSL Up] > [SSL Down]', ...)
+#     tf.update(new_bars)                                               # only the last period is resampled again
+#
+# The bars are resampled as pandas' resample(rule) (Open first, High max, Low min, Close & Adj Close last, Volume
+# sum; missing values skipped, periods without bars left out), for all the tickers of a panel at once on
+# (bars x tickers) arrays. Fixed-length bins (hours, days ...) are anchored at midnight of the first day of the
+# history, as pandas' default origin='start_day', and TimeframeCache keeps that origin when new bars are appended,
+# so resampling the new bars gives the same bins as resampling the whole history.
+# No look-ahead: a higher-timeframe bar (and its indicators) is seen by the base bars from the last base bar of
+# its period on, i.e. on the close of that bar like the daily indicators (position_tracker then trades on the
+# next bar); before that the base bars see the previous period. The last period of the history may still be
+# incomplete, so it is only used with partial=True.
+
+AGGREGATION = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Adj Close': 'last', 'Volume': 'sum'}
+
+# bins of the rule over a (sorted) date index: labels, first & last row of each bin with bars. Fixed-length bins
+# (Tick & Day offsets) are numbered from origin (default: midnight of the first date, as pandas' origin='start_day';
+# pandas 3 no longer takes an origin for days), calendar bins (weeks, months ...) are resampled by pandas.
+def _bins(index, rule, origin=None):
+    offset = to_offset(rule)
+    if isinstance(offset, (Tick, Day)):
+        if len(index) == 0:
+            return index[:0], np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        origin = index[0].normalize() if origin is None else origin
+        if isinstance(offset, Day):
+            # calendar days of the local time, as pandas 3 (23 or 25 hours on daylight saving changes)
+            step = pd.Timedelta(days=offset.n)
+            wall = index.tz_localize(None) if index.tz is not None else index
+            wall_origin = origin.tz_localize(None) if origin.tz is not None else origin
+            codes = np.asarray((wall.normalize() - wall_origin) // step)
+        else:
+            step = pd.Timedelta(offset)
+            codes = np.asarray((index - origin) // step)
+        starts = np.flatnonzero(np.diff(codes, prepend=codes[0] - 1))
+        ends = np.append(starts[1:], len(index)) - 1
+        if isinstance(offset, Day):
+            labels = pd.DatetimeIndex(wall_origin + step * codes[starts]).tz_localize(index.tz)
+        else:
+            labels = pd.DatetimeIndex(origin + step * codes[starts])
+        return labels.rename(index.name).as_unit(index.unit), starts, ends
+    rows = pd.Series(np.arange(len(index)), index=index).resample(rule)
+    first, last = rows.min(), rows.max()
+    keep = first.notna().to_numpy()
+    return first.index[keep], first.to_numpy()[keep].astype(int), last.to_numpy()[keep].astype(int)
+
+# one field resampled from a (bars x tickers) array, bins starting at rows `starts`
+def _aggregate(values, how, starts):
+    values = np.asarray(values, dtype=float)
+    n = values.shape[0]
+    if how == 'max':
+        return np.fmax.reduceat(values, starts, axis=0)
+    if how == 'min':
+        return np.fmin.reduceat(values, starts, axis=0)
+    valid = ~np.isnan(values)
+    if how == 'sum':
+        # 0 for a period without values, as pandas (tickers without any bar in the period are NaN, see below)
+        return np.add.reduceat(np.where(valid, values, 0), starts, axis=0)
+    rows = np.arange(n)[:, None]
+    ends = np.append(starts[1:], n)[:, None]
+    if how == 'first':
+        row = np.minimum.reduceat(np.where(valid, rows, n), starts, axis=0)
+        found = row < ends
+    else:
+        row = np.maximum.reduceat(np.where(valid, rows, -1), starts, axis=0)
+        found = row >= starts[:, None]
+    return np.where(found, np.take_along_axis(values, np.clip(row, 0, n - 1), axis=0), np.nan)
+
+# fields (dictionary of field -> (bars x tickers) array) resampled on bins starting at rows `starts`;
+# bins where a ticker has no Close are NaN for every field of that ticker
+def _resample_fields(fields, starts):
+    resampled = {field: _aggregate(values, AGGREGATION.get(field, 'last'), starts) for field, values in fields.items()}
+    if 'Close' in resampled:
+        missing = np.isnan(resampled['Close'])
+        for values in resampled.values():
+            values[missing] = np.nan
+    return resampled
+
+# one ticker's OHLCV DataFrame resampled to the rule (e.g. 'W-FRI', 'ME', '4h'), as
+# df.resample(rule).agg(AGGREGATION) without the periods where the ticker has no bars
+def resample_bars(df, rule):
+    labels, starts, _ = _bins(df.index, rule)
+    fields = {field: df[field].to_numpy(dtype=float)[:, None] for field in df.columns}
+    resampled = _resample_fields(fields, starts)
+    bars = pd.DataFrame({field: values[:, 0] for field, values in resampled.items()}, index=labels)
+    return bars[bars['Close'].notna()] if 'Close' in bars else bars
+
+# a panel of wide DataFrames (field -> dates x tickers, as ohlcv_store_v1_0.load_panel) resampled to the rule,
+# all the tickers at once
+def resample_panel(panel, rule):
+    first = next(iter(panel.values()))
+    labels, starts, _ = _bins(first.index, rule)
+    resampled = _resample_fields({field: frame.to_numpy(dtype=float) for field, frame in panel.items()}, starts)
+    return {field: pd.DataFrame(values, index=labels, columns=first.columns) for field, values in resampled.items()}
+
+# values of the higher-timeframe bars (Series or DataFrame, one row per bin with bars) on the base bars: the bin
+# ending on row last_rows[k] of the base bars is seen from that row on (see the top of this file)
+def align_to_base(values, last_rows, base_index, partial=False):
+    last_rows = np.asarray(last_rows)
+    if not partial:
+        values, last_rows = values.iloc[:-1], last_rows[:-1]
+    positions = np.full(len(base_index), -1)
+    positions[last_rows] = np.arange(len(last_rows))
+    positions = np.maximum.accumulate(positions)
+    taken = values.iloc[np.maximum(positions, 0)]
+    seen = np.reshape(positions >= 0, (-1,) + (1,) * (taken.ndim - 1))
+    taken = taken.where(np.broadcast_to(seen, taken.shape))
+    taken.index = base_index
+    return taken
+
+# resampled bars & higher-timeframe indicators of one ticker (OHLCV DataFrame) or of a panel (dictionary of wide
+# DataFrames), cached per rule and updated incrementally when new base bars arrive
+class TimeframeCache:
+    def __init__(self, base):
+        self.panel = isinstance(base, dict)
+        frames = base if self.panel else {field: base[[field]] for field in base.columns}
+        first = next(iter(frames.values()))
+        self.index = first.index
+        self.columns = first.columns if self.panel else None
+        self.fields = {field: frame.to_numpy(dtype=float) for field, frame in frames.items()}
+        # anchor of the bins for the whole life of the cache, see the top of this file
+        self.origin = self.index[0].normalize()
+        # rule -> (labels, first rows, last rows, fields); (rule, function, args) -> aligned indicator
+        self._bars = {}
+        self._indicators = {}
+
+    def _resampled(self, rule):
+        if rule not in self._bars:
+            labels, starts, ends = _bins(self.index, rule, self.origin)
+            self._bars[rule] = (labels, starts, ends, _resample_fields(self.fields, starts))
+        return self._bars[rule]
+
+    # the resampled bars: a DataFrame for one ticker, a dictionary of wide DataFrames for a panel
+    def bars(self, rule):
+        labels, _, _, fields = self._resampled(rule)
+        if self.panel:
+            return {field: pd.DataFrame(values, index=labels, columns=self.columns) for field, values in fields.items()}
+        bars = pd.DataFrame({field: values[:, 0] for field, values in fields.items()}, index=labels)
+        return bars[bars['Close'].notna()] if 'Close' in bars else bars
+
+    # a field of the resampled bars on the base bars, without look-ahead
+    def aligned(self, rule, field, partial=False):
+        labels, _, ends, fields = self._resampled(rule)
+        values = pd.DataFrame(fields[field], index=labels, columns=self.columns)
+        aligned = align_to_base(values, ends, self.index, partial)
+        return aligned if self.panel else aligned.iloc[:, 0].rename(f'{field} {rule}')
+
+    # function(bars, *args, **kwargs) (e.g. EMA, SSL, ATR from TA_indicators_v2_1) computed on the resampled
+    # bars and aligned to the base bars without look-ahead. for a panel it is computed ticker by ticker and a
+    # Series result becomes a wide DataFrame, a DataFrame result a dictionary of column -> wide DataFrame.
+    def indicator(self, rule, function, *args, partial=False, **kwargs):
+        key = (rule, function, args, tuple(sorted(kwargs.items())), partial)
+        if key not in self._indicators:
+            labels, _, ends, fields = self._resampled(rule)
+            if not self.panel:
+                result = function(self._ticker_bars(labels, fields, 0), *args, **kwargs).reindex(labels)
+                self._indicators[key] = align_to_base(result, ends, self.index, partial)
+            else:
+                results = {ticker: function(self._ticker_bars(labels, fields, j), *args, **kwargs)
+                           .reindex(labels) for j, ticker in enumerate(self.columns)}
+                aligned = {ticker: align_to_base(result, ends, self.index, partial) for ticker, result in results.items()}
+                first = next(iter(aligned.values()))
+                if isinstance(first, pd.Series):
+                    self._indicators[key] = pd.DataFrame(aligned)
+                else:
+                    self._indicators[key] = {column: pd.DataFrame({ticker: a[column] for ticker, a in aligned.items()})
+                                             for column in first.columns}
+        return self._indicators[key]
+
+    # bars of one ticker, without its periods without bars (the indicators skip them as a shorter history)
+    def _ticker_bars(self, labels, fields, column):
+        bars = pd.DataFrame({field: values[:, column] for field, values in fields.items()}, index=labels)
+        return bars[bars['Close'].notna()] if 'Close' in bars else bars.dropna(how='all')
+
+    # append the base bars newer than the last one (a DataFrame, or a dictionary of wide DataFrames with the same
+    # tickers for a panel); the cached bars are resampled again from the start of their last period only, the
+    # indicators are recomputed when next asked for. returns the number of bars appended.
+    def update(self, new):
+        frames = new if self.panel else {field: new[[field]] for field in self.fields}
+        first = next(iter(frames.values()))
+        newer = first.index > self.index[-1]
+        if not newer.any():
+            return 0
+        self.index = self.index.append(first.index[newer])
+        for field in self.fields:
+            frame = frames[field] if not self.panel else frames[field].reindex(columns=self.columns)
+            self.fields[field] = np.concatenate([self.fields[field], frame.to_numpy(dtype=float)[newer]])
+
+        for rule, (labels, starts, ends, fields) in self._bars.items():
+            # the last period may be extended by the new bars: resample from its first bar
+            start = starts[-1]
+            tail_labels, tail_starts, tail_ends = _bins(self.index[start:], rule, self.origin)
+            tail = _resample_fields({field: values[start:] for field, values in self.fields.items()}, tail_starts)
+            self._bars[rule] = (labels[:-1].append(tail_labels), np.append(starts[:-1], tail_starts + start),
+                                np.append(ends[:-1], tail_ends + start),
+                                {field: np.concatenate([fields[field][:-1], tail[field]]) for field in fields})
+        self._indicators.clear()
+        return int(newer.sum())
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from long_short_screen_v1_3 import position_tracker, leg_returns, calculateMaxDD
+from multistock_runner_v1_0 import EMA_VORTEX_SSL
+
+# Walk-forward / rolling-window screening around the long_short_screen engine.
+#
+# The indicators, signals, position trackers and the daily returns of the long & short legs are computed once
+# over the full history; every window is then a slice of those daily returns, so the positions are the ones the
+# strategy would actually hold on those bars (a trade opened before the window starts is carried into it).
+# The windows are evaluated together, one column per window, on (bars x windows) arrays: shorter windows are
+# padded after their last bar with a flat equity at the window's high watermark, which doesn't change their
+# drawdowns. The KPIs of a window are those of screen_kpis on the same slice of returns.
+#
+#     results = walk_forward(df, train=504, test=126)                  # sliding 2-year / 6-month windows
+#     results = walk_forward(df, train=504, test=126, expanding=True)  # in-sample from the first bar
+
+KPIS = ['Max Drawdown','Max Drawdown Duration','Sharpe Ratio','CAGR']
+
+# in-sample / out-of-sample windows as bar positions [start, end): the in-sample window is `train` bars (or every
+# bar from the first one with expanding=True), followed by `test` out-of-sample bars; windows move by `step` bars
+# (default: test, so the out-of-sample windows don't overlap)
+def walk_forward_windows(n_bars, train, test, step=None, expanding=False):
+    step = test if step is None else step
+    oos_start = np.arange(train, n_bars - test + 1, step)
+    is_start = np.zeros_like(oos_start) if expanding else oos_start - train
+    return pd.DataFrame({'IS start': is_start, 'IS end': oos_start, 'OOS start': oos_start, 'OOS end': oos_start + test})
+
+# daily returns of the long & short legs over the full history (indicators & signals computed once)
+def leg_daily_returns(data, strategy=EMA_VORTEX_SSL, spread=0.005, fees=0.05):
+    df = data.copy()
+    df['Percent Change'] = df['Close'].pct_change()
+    if isinstance(strategy, tuple):
+        indicators, signals = strategy
+        indicators(df)
+        long_entry, long_exit, short_entry, short_exit = signals(df)
+    else:
+        long_entry, long_exit, short_entry, short_exit = strategy(df)
+    pct_change = df['Percent Change'].to_numpy(dtype=float)
+    open_price, close_price = df['Open'].to_numpy(dtype=float), df['Close'].to_numpy(dtype=float)
+    pct_change_long = leg_returns(position_tracker(long_entry, long_exit, 1), 1, pct_change, open_price, close_price, spread, fees)
+    pct_change_short = leg_returns(position_tracker(short_entry, short_exit, -1), -1, pct_change, open_price, close_price, spread, fees)
+    return pct_change_long, pct_change_short
+
+# KPIs of the bars [starts[j], ends[j]) of the daily returns of each leg, one row per window.
+# batch_size windows are evaluated at a time to keep the memory bounded.
+def window_kpis(pct_change_long, pct_change_short, starts, ends, batch_size=256):
+    starts, ends = np.asarray(starts, dtype=int), np.asarray(ends, dtype=int)
+    results = []
+    for b in range(0, len(starts), batch_size):
+        start, end = starts[b:b + batch_size], ends[b:b + batch_size]
+        length = end - start
+        bars = np.arange(length.max())[:, None]
+        inside = bars < length
+        rows = np.where(inside, start + bars, 0)
+
+        # flat legs after the end of each window
+        long_w = np.where(inside, pct_change_long[rows], 0)
+        short_w = np.where(inside, pct_change_short[rows], 0)
+        equity_net = 0.5 * (np.cumprod(1 + long_w, axis=0) + np.cumprod(1 + short_w, axis=0))
+        cols = np.arange(len(start))
+        final = equity_net[length - 1, cols]
+
+        padded = np.where(inside, equity_net, np.max(np.where(inside, equity_net, -np.inf), axis=0))
+        maxDD, maxDDD, _ = calculateMaxDD(padded)
+
+        # as in screen_kpis: excess returns over a 2.5% risk-free rate, 252 trading days per year
+        excessRet = np.where(inside, 0.5 * (long_w + short_w) - (0.025/252), 0)
+        mean = excessRet.sum(axis=0) / length
+        std = np.sqrt(np.where(inside, (excessRet - mean)**2, 0).sum(axis=0) / length)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.sqrt(252) * mean / std
+        cagr = final**(1/(length/252)) - 1
+        results.append(pd.DataFrame({'Max Drawdown': maxDD, 'Max Drawdown Duration': maxDDD,
+                                     'Sharpe Ratio': sharpe, 'CAGR': cagr}))
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=KPIS)
+
+# walk-forward screen of one ticker's OHLC DataFrame: one row per window with its in-sample & out-of-sample dates
+# and the KPIs of both
+def walk_forward(data, strategy=EMA_VORTEX_SSL, train=504, test=126, step=None, expanding=False,
+                 spread=0.005, fees=0.05, batch_size=256):
+    pct_change_long, pct_change_short = leg_daily_returns(data, strategy, spread, fees)
+    windows = walk_forward_windows(len(data), train, test, step, expanding)
+    in_sample = window_kpis(pct_change_long, pct_change_short, windows['IS start'], windows['IS end'], batch_size)
+    out_of_sample = window_kpis(pct_change_long, pct_change_short, windows['OOS start'], windows['OOS end'], batch_size)
+
+    index = data.index
+    results = pd.DataFrame({'IS start': index[windows['IS start']], 'IS end': index[windows['IS end'] - 1],
+                            'OOS start': index[windows['OOS start']], 'OOS end': index[windows['OOS end'] - 1]})
+    for label, kpis in (('IS', in_sample), ('OOS', out_of_sample)):
+        for kpi in KPIS:
+            results[f'{label} {kpi}'] = kpis[kpi].to_numpy()
+    return results